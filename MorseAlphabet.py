@@ -0,0 +1,249 @@
+####################################################################################################################
+# IMPORTS
+import hashlib
+import json
+import os
+import threading
+import warnings
+
+from types import MappingProxyType
+
+
+####################################################################################################################
+# CONSTANTS
+ALPHABET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "res", "morse_alphabet.json")
+ALPHABET_GROUPS = ('chars', 'digits', 'punctuation_marks')  # In lookup priority order
+CACHE_VERSION = 2  # Bump when the compiled format changes, so older cache files are ignored
+
+
+####################################################################################################################
+# ERRORS
+class AlphabetError(ValueError):
+    pass
+
+
+class AlphabetWarning(UserWarning):
+    pass
+
+
+####################################################################################################################
+# CORE
+def normalize_morse(morse_text):
+    # Some codes use '_' in place of '-', and '|' is a code on its own even without blanks around it
+    return morse_text.replace('_', '-').replace('|', ' | ')
+
+
+class _EncodeTable(dict):
+    # Encoding table where every char missing from the alphabet is encoded as a blank
+    def __missing__(self, key):
+        return '  '
+
+
+class MorseAlphabet:
+    # Validated and compiled tables of an alphabet file. Every table is read-only, so a single instance can be
+    # shared by all the converters of the process
+
+    # ---> CONSTRUCTOR
+    def __init__(self, path, str_to_morse, morse_to_str, encode_table, decode_table):
+        self.path = path
+
+        # Views of private copies: nobody holds a mutable reference to the shared tables
+        self.str_to_morse = MappingProxyType({group: MappingProxyType(dict(table))
+                                              for group, table in str_to_morse.items()})
+        self.morse_to_str = MappingProxyType({group: MappingProxyType(dict(table))
+                                              for group, table in morse_to_str.items()})
+        self.decode_table = MappingProxyType(dict(decode_table))
+
+        self._encode_table = _EncodeTable(encode_table)
+
+        # Bound lookup of the encoding table: chars missing from the alphabet become a blank
+        self.encode_char = self._encode_table.__getitem__
+
+    # ---> FUNCTIONS
+    @classmethod
+    def from_json(cls, path, json_content):
+        str_to_morse, morse_to_str = validate_alphabet(path, json_content)
+
+        # Flatten chars, digits and punctuation marks in a single lookup table, each code followed by its blank.
+        # The groups are merged in reverse priority, so the lookup order is the same of the nested dicts
+        encode_table = {}
+        for group in reversed(ALPHABET_GROUPS):
+            for char, code in str_to_morse[group].items():
+                encode_table[char] = code + ' '
+
+        encode_table[' '] = '| '
+
+        decode_table = {'|': ' '}
+        for group in reversed(ALPHABET_GROUPS):
+            decode_table.update(morse_to_str[group])
+
+        return cls(path, str_to_morse, morse_to_str, encode_table, decode_table)
+
+    def get_compiled(self):
+        # Plain copies of the tables, as stored in the on-disk cache
+        return ({group: dict(table) for group, table in self.str_to_morse.items()},
+                {group: dict(table) for group, table in self.morse_to_str.items()},
+                dict(self._encode_table), dict(self.decode_table))
+
+
+def validate_alphabet(path, json_content):
+    # Check the alphabet and return its (str_to_morse, morse_to_str) tables, with every code normalized.
+    # '_' used in place of '-' is fixed with a warning, any ambiguity raises an AlphabetError
+    try:
+        raw_str_to_morse = json_content['morse_code']['str_to_morse']
+        raw_morse_to_str = json_content['morse_code']['morse_to_str']
+    except (KeyError, TypeError) as error:
+        raise AlphabetError(f"{path}: missing morse_code tables") from error
+
+    errors = []
+    underscored = []
+    str_to_morse = {}
+    morse_to_str = {}
+    chars_by_code = {}
+
+    for group in ALPHABET_GROUPS:
+        str_to_morse[group] = {}
+        for char, code in raw_str_to_morse.get(group, {}).items():
+            if len(char) != 1 or char == ' ':
+                errors.append(f"{group}: invalid char {char!r}")
+
+            if not code or set(code) - set('.-_'):
+                errors.append(f"{group}: invalid code {code!r} for {char!r}")
+
+            if '_' in code:
+                underscored.append(char)
+                code = code.replace('_', '-')
+
+            if code in chars_by_code:
+                errors.append(f"{group}: duplicate code {code!r} for {chars_by_code[code]!r} and {char!r}")
+
+            chars_by_code[code] = char
+            str_to_morse[group][char] = code
+
+        morse_to_str[group] = {}
+        for code, char in raw_morse_to_str.get(group, {}).items():
+            code = code.replace('_', '-')
+            if str_to_morse[group].get(char) != code:
+                errors.append(f"{group}: reverse entry {code!r} -> {char!r} doesn't match str_to_morse")
+
+            morse_to_str[group][code] = char
+
+        for char, code in str_to_morse[group].items():
+            if morse_to_str[group].get(code) != char:
+                errors.append(f"{group}: {char!r} -> {code!r} is missing from morse_to_str")
+
+    if errors:
+        raise AlphabetError(f"{path}: invalid alphabet\n" + "\n".join(errors))
+
+    if underscored:
+        warnings.warn(f"{path}: '_' used in place of '-' in the codes of {', '.join(underscored)}", AlphabetWarning,
+                      stacklevel=3)
+
+    return str_to_morse, morse_to_str
+
+
+class AlphabetRegistry:
+    # Process wide registry: every alphabet file is loaded, validated and compiled once, then shared.
+    # Alphabets are keyed by their real path, so several of them can be used side by side.
+    # With cache_dir, compiled alphabets are also stored on disk, invalidated by the file size, mtime and hash.
+    # get can also be given its own cache_dir, used when the alphabet isn't already loaded in the process
+
+    # ---> CONSTRUCTOR
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.loads = 0
+        self.cache_loads = 0
+
+        self._alphabets = {}
+        self._lock = threading.Lock()
+
+    # ---> FUNCTIONS
+    def get(self, path=None, cache_dir=None):
+        path = os.path.realpath(path or ALPHABET_PATH)
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            entry = self._alphabets.get(path)
+            if entry is None or entry[0] != signature:
+                entry = (signature, self._load(path, cache_dir or self.cache_dir))
+                self._alphabets[path] = entry
+
+        return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._alphabets.clear()
+
+    def _load(self, path, cache_dir):
+        with open(path, "rb") as file:
+            content = file.read()
+
+        digest = hashlib.sha256(content).hexdigest()
+
+        alphabet = self._read_cache(cache_dir, path, digest)
+        if alphabet is not None:
+            self.cache_loads += 1
+            return alphabet
+
+        alphabet = MorseAlphabet.from_json(path, json.loads(content))
+        self.loads += 1
+
+        self._write_cache(cache_dir, path, digest, alphabet)
+        return alphabet
+
+    @staticmethod
+    def _get_cache_path(cache_dir, path):
+        name = hashlib.sha1(path.encode()).hexdigest()
+        return os.path.join(cache_dir, f"alphabet_{name}.json")
+
+    def _read_cache(self, cache_dir, path, digest):
+        if cache_dir is None:
+            return None
+
+        try:
+            # Plain JSON data: a file planted in cache_dir can't run any code, at worst it is ignored
+            with open(self._get_cache_path(cache_dir, path), "r", encoding="utf-8") as file:
+                cache = json.load(file)
+
+            version, cached_digest, compiled = cache["version"], cache["digest"], cache["compiled"]
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+        # The file content hash decides, so a touched but unchanged file still hits the cache
+        if version != CACHE_VERSION or cached_digest != digest:
+            return None
+
+        # Four tables, the first two nested by group
+        if not (isinstance(compiled, list) and len(compiled) == 4
+                and all(isinstance(table, dict) for table in compiled)
+                and all(isinstance(table, dict) for tables in compiled[:2] for table in tables.values())):
+            return None
+
+        return MorseAlphabet(path, *compiled)
+
+    def _write_cache(self, cache_dir, path, digest, alphabet):
+        if cache_dir is None:
+            return
+
+        # Write then rename, so concurrent processes never read a partial file
+        cache_path = self._get_cache_path(cache_dir, path)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump({"version": CACHE_VERSION, "digest": digest, "compiled": alphabet.get_compiled()}, file,
+                          ensure_ascii=False)
+
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # The cache is only an optimization
+            pass
+
+
+# Shared by every MorseConverter of the process
+registry = AlphabetRegistry()
+
+
+def get_alphabet(path=None, cache_dir=None):
+    return registry.get(path, cache_dir)
@@ -0,0 +1,226 @@
+####################################################################################################################
+# IMPORTS
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+####################################################################################################################
+# CORE
+class AudioCache:
+    # Two tier cache of rendered int16 audio, content addressed by the morse text and the timing parameters.
+    # The memory tier is an LRU bounded in bytes; the optional disk tier stores .npy files, served through memory
+    # maps and bounded in total size by evicting the least recently used files. The disk tier is scanned once,
+    # then its files and total size are tracked in memory (files written by other processes are picked up when
+    # they are read).
+    # Cached arrays are read-only, since they are shared by every caller: put copies writeable arrays, so a caller
+    # handing over its array marks it read-only first
+
+    # ---> CONSTRUCTOR
+    def __init__(self, memory_budget=64 * 1024 * 1024, disk_dir=None, disk_budget=1024 * 1024 * 1024):
+        self.memory_budget = memory_budget
+        self.disk_dir = disk_dir
+        self.disk_budget = disk_budget
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        # path -> size of the disk tier files, least recently used first
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+            for path, size, _ in sorted(self._list_disk(), key=lambda entry: entry[2]):
+                self._disk[path] = size
+                self._disk_bytes += size
+
+    # ---> FUNCTIONS
+    @staticmethod
+    def make_key(morse_text, frequency, sampling_rate, duration_dot, dtype=np.int16):
+        key_hash = hashlib.sha256()
+        key_hash.update(f"{frequency}|{sampling_rate}|{duration_dot!r}|{np.dtype(dtype).str}|".encode())
+        key_hash.update(morse_text.encode())
+        return key_hash.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+
+        audio = self._read_disk(key)
+        if audio is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._put_memory(key, audio)
+
+        return audio
+
+    def put(self, key, audio):
+        audio = np.asarray(audio)
+        if audio.flags.writeable:
+            audio = audio.copy()
+            audio.flags.writeable = False
+
+        with self._lock:
+            self._put_memory(key, audio)
+
+        self._write_disk(key, audio)
+        return audio
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+        if disk and self.disk_dir is not None:
+            for path, _, _ in self._list_disk():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+            with self._lock:
+                self._disk.clear()
+                self._disk_bytes = 0
+
+    def _put_memory(self, key, audio):
+        # Entries larger than the whole budget are only kept on disk
+        if audio.nbytes > self.memory_budget:
+            return
+
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+
+        self._memory[key] = audio
+        self._memory_bytes += audio.nbytes
+
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self.memory_evictions += 1
+
+    def _get_disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def _read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+
+        path = self._get_disk_path(key)
+        try:
+            audio = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        # The file mtime tracks the last use across processes, the tracked order within this one
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            size = self._disk.get(path)
+
+        if size is None:
+            # Written by another process
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+
+        with self._lock:
+            self._track_disk(path, size)
+
+        return audio
+
+    def _write_disk(self, key, audio):
+        if self.disk_dir is None or audio.nbytes > self.disk_budget:
+            return
+
+        # Write then rename, so concurrent readers never map a partial file
+        path = self._get_disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                np.save(file, audio)
+
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            self._track_disk(path, size)
+            evicted = self._pop_disk_evictions()
+
+        for path in evicted:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _track_disk(self, path, size):
+        # Record path as the most recently used file
+        self._disk_bytes += size - self._disk.pop(path, 0)
+        self._disk[path] = size
+
+    def _pop_disk_evictions(self):
+        # Untrack the least recently used files until the disk tier fits its budget, returning their paths
+        evicted = []
+        while self._disk_bytes > self.disk_budget and self._disk:
+            path, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+            evicted.append(path)
+
+        return evicted
+
+    def _list_disk(self):
+        # (path, size, mtime) of every cached file
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+
+        return entries
@@ -0,0 +1,388 @@
+####################################################################################################################
+# IMPORTS
+import struct
+import time
+
+import numpy as np
+
+
+####################################################################################################################
+# CORE
+def read_wav(source):
+    # Memory map the samples of a 16 bit PCM WAV file, returning (sampling_rate, samples) of the first channel.
+    # A file-like object can't be mapped, so its samples are read in memory
+    if hasattr(source, "read"):
+        wav_bytes = source.read()
+        sampling_rate, channels, offset, size = _parse_wav_header(wav_bytes, len(wav_bytes))
+        samples = np.frombuffer(wav_bytes, dtype='<i2', count=size // 2, offset=offset)
+
+    else:
+        with open(source, "rb") as file:
+            header = file.read(1 << 16)
+            file.seek(0, 2)
+            file_size = file.tell()
+
+        sampling_rate, channels, offset, size = _parse_wav_header(header, file_size)
+        if size == 0:
+            return sampling_rate, np.zeros(0, dtype=np.int16)
+
+        samples = np.memmap(source, dtype='<i2', mode='r', offset=offset, shape=(size // 2,))
+
+    frames_count = len(samples) // channels
+    return sampling_rate, samples[:frames_count * channels].reshape(frames_count, channels)[:, 0]
+
+
+def _parse_wav_header(header, file_size):
+    # Walk the RIFF chunks until the data chunk, returning (sampling_rate, channels, data offset, data size)
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+
+    fmt = None
+    position = 12
+    while position + 8 <= len(header):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", header, position)
+        position += 8
+
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", header, position)
+
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk found before fmt chunk")
+
+            audio_format, channels, sampling_rate, _, _, bits_per_sample = fmt
+            if audio_format != 1 or bits_per_sample != 16:
+                raise ValueError("Only 16 bit PCM WAV files are supported")
+
+            # Streamed files may leave the data size unpatched: never read past the end of file
+            size = min(chunk_size, file_size - position)
+            return sampling_rate, channels, position, size - size % 2
+
+        # Chunks are word aligned
+        position += chunk_size + chunk_size % 2
+
+    raise ValueError("WAV data chunk not found")
+
+
+class MorseAudioDecoder:
+    # Turn morse audio back into morse text: the tone at FREQUENCY is detected block by block with a vectorized
+    # Goertzel filter, then on/off runs are classified in dots, dashes and gaps by their length in dot units
+
+    # ---> CONSTANTS
+    BLOCKS_PER_DOT = 10  # Time resolution of the tone detection
+    SLAB_BLOCKS = 4096  # Blocks filtered at once, so memory stays bounded on long files
+    ON_THRESHOLD = 0.5  # Fraction of the way from the noise floor to the tone level over which a block is keyed
+    MIN_LEVEL = 0.02  # Tone level, in full scale units, under which nothing is keyed
+    SNR_MARGIN = 16  # Nothing is keyed unless the tone level reaches this multiple of the noise floor.
+    # Pure noise peaks at about 10 times its floor, even over minutes of audio
+
+    # Run lengths in dot units which separate dots from dashes and the gaps between elements, letters and words.
+    # Standard timing has 3 unit letter gaps and 7 unit word gaps, while MorseConverter emits a 1 unit gap after
+    # every element, so its letter gaps last 5 units and its word gaps 17. The word gap threshold is learned from
+    # the gaps of the signal, WORD_GAP_UNITS only decides when they don't tell (e.g. a single word)
+    DASH_UNITS = 2
+    LETTER_GAP_UNITS = 2.5
+    WORD_GAP_UNITS = 6
+    WORD_GAP_JUMP = 1.8  # Ratio between consecutive sorted gap lengths which splits letter gaps from word gaps
+
+    # ---> CONSTRUCTOR
+    def __init__(self, frequency, sampling_rate, duration_dot, word_gap_units=None):
+        self.frequency = frequency
+        self.sampling_rate = sampling_rate
+        self.duration_dot = duration_dot
+        self.word_gap_units = word_gap_units or self.WORD_GAP_UNITS
+
+        self.block_size = max(1, int(sampling_rate * duration_dot / self.BLOCKS_PER_DOT))
+
+        # Goertzel filter at the block level is a single DFT bin: the projection on a cosine and a sine
+        t = np.arange(self.block_size) / sampling_rate
+        self._basis = np.stack((np.cos(2 * np.pi * frequency * t), np.sin(2 * np.pi * frequency * t)), axis=1)
+
+    # ---> FUNCTIONS
+    def get_tone_levels(self, samples):
+        # Amplitude of the tone for every block of samples (a trailing partial block is dropped)
+        blocks_count = len(samples) // self.block_size
+        levels = np.empty(blocks_count)
+
+        for first_block in range(0, blocks_count, self.SLAB_BLOCKS):
+            last_block = min(first_block + self.SLAB_BLOCKS, blocks_count)
+            slab = samples[first_block * self.block_size:last_block * self.block_size]
+            slab = np.asarray(slab, dtype=np.float64).reshape(-1, self.block_size)
+
+            projection = slab @ self._basis
+            levels[first_block:last_block] = np.hypot(projection[:, 0], projection[:, 1])
+
+        return levels * (2 / self.block_size)
+
+    def get_keying(self, samples):
+        # True for every block where the tone is on
+        levels = self.get_tone_levels(samples)
+        if len(levels) == 0:
+            return np.zeros(0, dtype=bool)
+
+        # Gaps always take a good share of morse audio, so the lowest levels are the noise floor.
+        # Audio without a tone clearly above the floor (silence or noise only) has nothing to key
+        full_scale = 32768 if np.issubdtype(np.asarray(samples).dtype, np.integer) else 1.0
+        noise_level = np.percentile(levels, 10)
+        tone_level = levels.max()
+        if tone_level < max(self.MIN_LEVEL * full_scale, noise_level * self.SNR_MARGIN):
+            return np.zeros(len(levels), dtype=bool)
+
+        return levels > noise_level + (tone_level - noise_level) * self.ON_THRESHOLD
+
+    @staticmethod
+    def get_runs(keying):
+        # Run length encoding of the keying, returning (states, lengths)
+        if len(keying) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+
+        starts = np.concatenate(([0], np.flatnonzero(keying[1:] != keying[:-1]) + 1))
+        lengths = np.diff(np.append(starts, len(keying)))
+        return keying[starts], lengths
+
+    def runs_to_morse(self, states, lengths):
+        # Leading and trailing silences carry no information
+        if len(states) > 0 and not states[0]:
+            states, lengths = states[1:], lengths[1:]
+
+        if len(states) > 0 and not states[-1]:
+            states, lengths = states[:-1], lengths[:-1]
+
+        if len(states) == 0:
+            return ""
+
+        units = lengths * self.block_size / (self.sampling_rate * self.duration_dot)
+        word_gap_units = self.get_word_gap_units(units[~states])
+        gap_symbols = np.where(units < self.LETTER_GAP_UNITS, "", np.where(units < word_gap_units, " ", " | "))
+        tone_symbols = np.where(units < self.DASH_UNITS, ".", "-")
+
+        return ''.join(np.where(states, tone_symbols, gap_symbols).tolist())
+
+    def get_word_gap_units(self, gap_units):
+        # Letter and word gaps are split at the largest jump between the sorted lengths of the gaps longer than
+        # an element gap. Without a clear jump the gaps are all of a kind, and word_gap_units decides
+        gaps = np.sort(gap_units[gap_units >= self.LETTER_GAP_UNITS])
+        if len(gaps) >= 2:
+            ratios = gaps[1:] / gaps[:-1]
+            jump = ratios.argmax()
+            if ratios[jump] >= self.WORD_GAP_JUMP:
+                return np.sqrt(gaps[jump] * gaps[jump + 1])
+
+        return self.word_gap_units
+
+    def decode_samples(self, samples):
+        return self.runs_to_morse(*self.get_runs(self.get_keying(samples)))
+
+    def decode_wav(self, source):
+        sampling_rate, samples = read_wav(source)
+        if sampling_rate != self.sampling_rate:
+            raise ValueError(f"Expected a sampling rate of {self.sampling_rate} Hz, got {sampling_rate} Hz")
+
+        return self.decode_samples(samples)
+
+
+class MorseStreamDecoder(MorseAudioDecoder):
+    # Decode live audio block by block, with bounded memory and latency: samples go through a fixed size ring
+    # buffer, keying thresholds, dot length and gap lengths adapt on the fly, and a letter is emitted as soon as
+    # the gap after it is long enough, so well within one character time from its keying
+
+    # ---> CONSTANTS
+    RING_BLOCKS = 64  # Capacity of the ring buffer, in detection blocks
+    NOISE_MARGIN = 4  # Nothing is keyed under this multiple of the noise level
+    GLITCH_UNITS = 0.3  # Tones shorter than this, in dot units, are noise
+    ADAPT_RATE = 0.2  # Weight of the last run on the adaptive estimates
+
+    # ---> CONSTRUCTOR
+    def __init__(self, frequency, sampling_rate, duration_dot, decode_table, replacement="\ufffd",
+                 word_gap_units=None):
+        super().__init__(frequency, sampling_rate, duration_dot, word_gap_units)
+
+        self.decode_table = decode_table
+        self.replacement = replacement
+
+        self._ring = np.zeros(self.block_size * self.RING_BLOCKS)
+        self._filled = 0
+
+        self.reset()
+
+    # ---> FUNCTIONS
+    def reset(self):
+        self._filled = 0
+
+        self.unit_blocks = self.sampling_rate * self.duration_dot / self.block_size
+        self.tone_level = 0.0
+        self.noise_level = 0.0
+
+        # Letter and word gap lengths in dot units, starting from the standard letter gap, with word_gap_units
+        # as their geometric mean: the word gap threshold
+        self.letter_gap_units = 3.0
+        self.word_gap_units_seen = self.word_gap_units ** 2 / self.letter_gap_units
+
+        self._keyed = False
+        self._run_blocks = 0
+        self._gap_blocks = 0
+        self._code = []
+        self._word_open = False
+        self._after_letter = False
+
+        # Per block timing stats
+        self.blocks_count = 0
+        self.samples_count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def feed(self, samples):
+        # Push a block of samples, returning the text decoded so far ("" if no letter was completed)
+        start_time = time.perf_counter()
+
+        samples = np.asarray(samples)
+        if np.issubdtype(samples.dtype, np.integer):
+            samples = samples / 32768
+
+        decoded = []
+        position = 0
+        while position < len(samples):
+            step = min(len(self._ring) - self._filled, len(samples) - position)
+            self._ring[self._filled:self._filled + step] = samples[position:position + step]
+            self._filled += step
+            position += step
+
+            decoded.append(self._process_ring())
+
+        elapsed = time.perf_counter() - start_time
+        self.blocks_count += 1
+        self.samples_count += len(samples)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+        return ''.join(decoded)
+
+    def flush(self):
+        # End of input: emit the pending letter
+        if self._keyed:
+            self._close_tone()
+            self._keyed = False
+            self._run_blocks = 0
+
+        return self._close_letter()
+
+    def decode_blocks(self, blocks):
+        # Decode any iterable of sample blocks, yielding the text as soon as it is decoded
+        for block in blocks:
+            text = self.feed(block)
+            if text:
+                yield text
+
+        text = self.flush()
+        if text:
+            yield text
+
+    def get_stats(self):
+        audio_time = self.samples_count / self.sampling_rate
+        return {
+            "blocks": self.blocks_count,
+            "audio_seconds": audio_time,
+            "processing_seconds": self.total_time,
+            "mean_block_seconds": self.total_time / self.blocks_count if self.blocks_count else 0.0,
+            "max_block_seconds": self.max_time,
+            "realtime_factor": audio_time / self.total_time if self.total_time else 0.0,
+            "dot_seconds": self.unit_blocks * self.block_size / self.sampling_rate,
+        }
+
+    def _process_ring(self):
+        # Filter every complete detection block in the ring, then keep the remainder at its start
+        blocks_count = self._filled // self.block_size
+        if blocks_count == 0:
+            return ""
+
+        used = blocks_count * self.block_size
+        projection = self._ring[:used].reshape(blocks_count, self.block_size) @ self._basis
+        levels = np.hypot(projection[:, 0], projection[:, 1]) * (2 / self.block_size)
+
+        remainder = self._filled - used
+        self._ring[:remainder] = self._ring[used:self._filled]
+        self._filled = remainder
+
+        return ''.join([self._process_level(level) for level in levels.tolist()])
+
+    def _process_level(self, level):
+        # Track tone and noise levels, then key the block halfway between them
+        threshold = max(self.MIN_LEVEL, self.noise_level * self.NOISE_MARGIN,
+                        self.noise_level + (self.tone_level - self.noise_level) * self.ON_THRESHOLD)
+
+        keyed = level > threshold
+        if keyed:
+            self.tone_level = max(level, self.tone_level * (1 - self.ADAPT_RATE) + level * self.ADAPT_RATE)
+        else:
+            self.noise_level = self.noise_level * (1 - self.ADAPT_RATE) + level * self.ADAPT_RATE
+
+        decoded = ""
+        if keyed != self._keyed:
+            if not keyed:
+                # A glitch doesn't break the gap it fell in
+                self._run_blocks = 0 if self._close_tone() else self._run_blocks + self._gap_blocks
+            else:
+                self._gap_blocks = self._run_blocks
+                self._run_blocks = 0
+
+            self._keyed = keyed
+
+        self._run_blocks += 1
+
+        if not keyed:
+            units = self._run_blocks / self.unit_blocks
+            if self._code and units >= self.LETTER_GAP_UNITS:
+                decoded = self._close_letter()
+
+            elif self._word_open and units >= self._get_word_gap_threshold():
+                self._word_open = False
+                decoded = " "
+
+        return decoded
+
+    def _close_tone(self):
+        # Returns False if the tone was too short to be an element
+        units = self._run_blocks / self.unit_blocks
+        if units < self.GLITCH_UNITS:
+            return False
+
+        if units < self.DASH_UNITS:
+            self._code.append(".")
+            unit_blocks = self._run_blocks
+        else:
+            self._code.append("-")
+            unit_blocks = self._run_blocks / 3
+
+        # The gap before the first element of a letter was a letter or a word gap
+        if self._after_letter:
+            self._learn_gap(self._gap_blocks / self.unit_blocks)
+            self._after_letter = False
+
+        # Follow the keying speed
+        self.unit_blocks = self.unit_blocks * (1 - self.ADAPT_RATE) + unit_blocks * self.ADAPT_RATE
+        return True
+
+    def _get_word_gap_threshold(self):
+        return (self.letter_gap_units * self.word_gap_units_seen) ** 0.5
+
+    def _learn_gap(self, units):
+        if units < self.LETTER_GAP_UNITS:
+            return
+
+        if units < self._get_word_gap_threshold():
+            self.letter_gap_units = self.letter_gap_units * (1 - self.ADAPT_RATE) + units * self.ADAPT_RATE
+        else:
+            # A pause in the transmission isn't a word gap: its weight is bounded
+            units = min(units, 2 * self.word_gap_units_seen)
+            self.word_gap_units_seen = self.word_gap_units_seen * (1 - self.ADAPT_RATE) + units * self.ADAPT_RATE
+
+    def _close_letter(self):
+        if not self._code:
+            return ""
+
+        code = ''.join(self._code)
+        self._code = []
+        self._word_open = True
+        self._after_letter = True
+
+        return self.decode_table.get(code, self.replacement)
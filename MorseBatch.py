@@ -0,0 +1,278 @@
+####################################################################################################################
+# IMPORTS
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from MorseConverter import MorseConverter, MorseTiming
+
+
+####################################################################################################################
+# CONSTANTS
+FORMATS = ("morse", "wav")
+STATUS_DONE = "done"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+
+####################################################################################################################
+# CORE
+class BatchItem:
+    # A message to convert: read from source_path in the worker, or carried as text for stdin messages
+
+    # ---> CONSTRUCTOR
+    def __init__(self, name, out_base, source_path=None, text=None):
+        self.name = name
+        self.out_base = out_base
+        self.source_path = source_path
+        self.text = text
+
+        # Set when the item can't be converted at all, e.g. its outputs clash with another item
+        self.error = None
+
+    # ---> FUNCTIONS
+    def get_out_paths(self, formats):
+        return [f"{self.out_base}.{out_format}" for out_format in formats]
+
+    def get_stamp_path(self):
+        return f"{self.out_base}.stamp"
+
+    def is_up_to_date(self, formats, stamp=None):
+        # Outputs are written atomically, so an existing output is always complete
+        out_paths = self.get_out_paths(formats)
+        if not all(os.path.isfile(out_path) for out_path in out_paths):
+            return False
+
+        # The WAV file is only up to date if it was rendered with the same parameters, see get_stamp
+        if "wav" in formats and stamp is not None:
+            try:
+                with open(self.get_stamp_path(), "r", encoding="utf-8") as file:
+                    if file.read() != stamp:
+                        return False
+            except OSError:
+                return False
+
+        if self.source_path is None:
+            # Stdin outputs are named after the message hash: existing means up to date
+            return True
+
+        # A missing source is converted anyway, so its error is reported by convert_item like any other
+        try:
+            source_mtime = os.path.getmtime(self.source_path)
+            return all(os.path.getmtime(out_path) >= source_mtime for out_path in out_paths)
+        except OSError:
+            return False
+
+
+def get_stamp(timing=None):
+    # Parameters of the rendered audio, stored next to the WAV outputs
+    timing = timing or MorseTiming()
+    return (f"frequency={MorseConverter.FREQUENCY} sampling_rate={MorseConverter.SAMPLING_RATE} "
+            f"duration_dot={timing.duration_dot!r}\n")
+
+
+def _get_pattern_root(pattern):
+    # Folder of a glob pattern before its first wildcard, e.g. "in" for "in/*/*.txt"
+    root = os.path.dirname(pattern)
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+
+    return root
+
+
+def _get_common_root(paths):
+    # Deepest folder of all the paths, e.g. "in" for in/a/x.txt and in/b/x.txt
+    folders = [os.path.abspath(os.path.dirname(path)) for path in paths]
+    try:
+        return os.path.relpath(os.path.commonpath(folders))
+    except ValueError:
+        # Paths on different drives have no common folder
+        return None
+
+
+def collect_items(inputs, out_dir, stdin=None):
+    # Files, directories (their *.txt files) and glob patterns; "-" or no inputs at all read messages from stdin.
+    # Outputs keep the path of their input relative to the directory, the pattern root or, for plain files, the
+    # common folder of them all, so "in/*/*.txt" writes in/a/x.txt to out_dir/a/x.*, quoted or expanded by the
+    # shell. Inputs which would still share their outputs are failed with an error, the others are converted
+    items = []
+    if not inputs or "-" in inputs:
+        names = set()
+        for line in stdin or sys.stdin:
+            text = line.rstrip("\n")
+            name = f"msg_{hashlib.sha1(text.encode()).hexdigest()[:16]}"
+
+            # Repeated messages share their outputs
+            if text.strip() and name not in names:
+                names.add(name)
+                items.append(BatchItem(name, os.path.join(out_dir, name), text=text))
+
+    # Plain files, as a shell expands "in/*/*.txt", share a single root
+    files = [pattern for pattern in inputs or () if pattern != "-" and not os.path.isdir(pattern)
+             and not glob.has_magic(pattern)]
+    files_root = _get_common_root(files) if files else None
+
+    for pattern in inputs or ():
+        if pattern == "-":
+            continue
+
+        if os.path.isdir(pattern):
+            root = pattern
+            paths = sorted(glob.glob(os.path.join(pattern, "*.txt")))
+        elif glob.has_magic(pattern):
+            root = _get_pattern_root(pattern)
+            paths = sorted(glob.glob(pattern)) or [pattern]
+        else:
+            root = files_root if files_root is not None else os.path.dirname(pattern)
+            paths = [pattern]
+
+        for path in paths:
+            name = os.path.splitext(os.path.relpath(path, root or "."))[0]
+            items.append(BatchItem(path, os.path.join(out_dir, name), source_path=path))
+
+    items_by_out_base = {}
+    for item in items:
+        items_by_out_base.setdefault(os.path.normpath(item.out_base), []).append(item)
+
+    # No clashing item wins over the others: they are all failed, so none overwrites the outputs of another
+    for clashing in items_by_out_base.values():
+        if len(clashing) > 1:
+            for item in clashing:
+                others = ", ".join(other.name for other in clashing if other is not item)
+                item.error = f"Same outputs as {others}"
+
+    return items
+
+
+# Converter of the worker process, built by the pool initializer
+_worker_converter = None
+
+
+def _init_worker(timing):
+    global _worker_converter
+    _worker_converter = MorseConverter(timing=timing)
+
+
+def convert_item(item, formats):
+    # Runs in the worker: any error is returned, so a bad item never stops the batch.
+    # Returns (name, status, audio seconds, error)
+    try:
+        text = item.text
+        if text is None:
+            with open(item.source_path, "r", encoding="utf-8") as file:
+                text = file.read()
+
+        morse_text = _worker_converter.string_to_morse(text)
+        audio_seconds = _worker_converter.get_samples_count(morse_text) / _worker_converter.SAMPLING_RATE
+
+        for out_format, out_path in zip(formats, item.get_out_paths(formats)):
+            # Write then rename, so an interrupted run never leaves a partial output which looks up to date
+            temp_path = f"{out_path}.{os.getpid()}.tmp"
+            try:
+                if out_format == "morse":
+                    with open(temp_path, "w", encoding="utf-8") as file:
+                        file.write(morse_text + "\n")
+                else:
+                    _worker_converter.export_wav(morse_text, temp_path)
+
+                os.replace(temp_path, out_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        # Written last, so WAV outputs of an interrupted run are rendered again
+        if "wav" in formats:
+            _write_atomic(item.get_stamp_path(), get_stamp(_worker_converter.timing))
+
+        return item.name, STATUS_DONE, audio_seconds, None
+
+    except Exception as error:
+        return item.name, STATUS_FAILED, 0.0, f"{type(error).__name__}: {error}"
+
+
+def _write_atomic(path, text):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def run_batch(items, formats, workers=None, force=False, timing=None, log=None):
+    # Convert the items in a process pool, returning a summary dict
+    start_time = time.perf_counter()
+    stamp = get_stamp(timing)
+    summary = {STATUS_DONE: 0, STATUS_SKIPPED: 0, STATUS_FAILED: 0, "audio_seconds": 0.0, "errors": []}
+
+    pending = []
+    for item in items:
+        if item.error is not None:
+            summary[STATUS_FAILED] += 1
+            summary["errors"].append((item.name, item.error))
+            if log is not None:
+                print(f"{item.name}: {item.error}", file=log)
+
+        elif not force and item.is_up_to_date(formats, stamp):
+            summary[STATUS_SKIPPED] += 1
+        else:
+            pending.append(item)
+
+    if pending:
+        for out_dir in {os.path.dirname(item.out_base) for item in pending}:
+            os.makedirs(out_dir or ".", exist_ok=True)
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(timing,)) as pool:
+            chunksize = max(1, len(pending) // ((workers or os.cpu_count() or 1) * 8))
+            results = pool.map(convert_item, pending, [formats] * len(pending), chunksize=chunksize)
+
+            for name, status, audio_seconds, error in results:
+                summary[status] += 1
+                summary["audio_seconds"] += audio_seconds
+                if error is not None:
+                    summary["errors"].append((name, error))
+                    if log is not None:
+                        print(f"{name}: {error}", file=log)
+
+    elapsed = time.perf_counter() - start_time
+    summary["seconds"] = elapsed
+    summary["messages_per_second"] = summary[STATUS_DONE] / elapsed if elapsed else 0.0
+    summary["audio_seconds_per_second"] = summary["audio_seconds"] / elapsed if elapsed else 0.0
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert text files, or newline delimited messages on stdin, to morse text and WAV files")
+    parser.add_argument("inputs", nargs="*",
+                        help="text files, directories of *.txt files or glob patterns; '-' or nothing reads stdin")
+    parser.add_argument("-o", "--out-dir", default="morse_out", help="output folder (default: %(default)s)")
+    parser.add_argument("-f", "--format", nargs="+", choices=FORMATS, default=list(FORMATS),
+                        help="outputs to produce (default: both)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--dot", type=float, default=MorseTiming().duration_dot,
+                        help="dot duration in seconds (default: %(default)s)")
+    parser.add_argument("--force", action="store_true", help="convert even the items already up to date")
+    args = parser.parse_args(argv)
+
+    items = collect_items(args.inputs, args.out_dir)
+    summary = run_batch(items, tuple(args.format), args.workers, args.force, MorseTiming(args.dot), log=sys.stderr)
+
+    print(f"{summary[STATUS_DONE]} converted, {summary[STATUS_SKIPPED]} skipped, {summary[STATUS_FAILED]} failed "
+          f"in {summary['seconds']:.2f} s: {summary['messages_per_second']:.1f} messages/s, "
+          f"{summary['audio_seconds_per_second']:.1f} audio-seconds/s")
+
+    return 1 if summary[STATUS_FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
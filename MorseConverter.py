@@ -1,35 +1,241 @@
 ####################################################################################################################
 # IMPORTS
-import json
+import importlib
 import os
+import queue
 import subprocess
+import sys
+import threading
 import time
+import wave
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
 
 import numpy as np
-import matplotlib.pyplot as plt
-import sounddevice as sd
-from scipy.io import wavfile
+
+from MorseAlphabet import ALPHABET_PATH, get_alphabet, normalize_morse
+from MorseAudioDecoder import MorseAudioDecoder, MorseStreamDecoder, read_wav
+from MorseMetrics import NullMetrics
+from MorseTimeline import MorseTimeline
+
+
+####################################################################################################################
+# OPTIONAL BACKENDS
+# The core only needs NumPy: playback and plotting backends are imported the first time they are used
+def _import_backend(module_name, feature):
+    try:
+        return importlib.import_module(module_name)
+    except (ImportError, OSError) as error:
+        raise ImportError(f"{feature} needs the optional '{module_name.split('.')[0]}' package: {error}") from error
+
+
+def _get_sounddevice():
+    return _import_backend("sounddevice", "Audio playback and recording")
+
+
+def _get_pyplot():
+    return _import_backend("matplotlib.pyplot", "Plotting")
+
+
+def _get_figure_class():
+    # Figures not managed by pyplot never open a window, so they can be saved on headless machines
+    return _import_backend("matplotlib.figure", "Plotting").Figure
 
 
 ####################################################################################################################
 # CORE
+class MorseTiming(NamedTuple):
+    # Immutable timing of a converter, so it can be shared with worker threads and processes
+    duration_dot: float = 100 / 1000  # Duration of the beep in seconds
+
+    @property
+    def duration_dash(self):
+        return self.duration_dot * 3
+
+    @property
+    def duration_pause(self):
+        return self.duration_dot * 7
+
+
+class WaveTemplateCache:
+    # Bounded LRU of the tone segments (dots and dashes), keyed by (FREQUENCY, SAMPLING_RATE, duration, dtype);
+    # silences need no template, they are left zero in the rendered buffers. Every segment is generated once and
+    # handed out as a read-only array, so callers can't corrupt shared samples
+
+    # ---> CONSTRUCTOR
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---> FUNCTIONS
+    def get(self, key, factory):
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+
+            self.misses += 1
+
+        template = factory()
+        template.flags.writeable = False
+
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+                self.evictions += 1
+
+        return template
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._templates),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+
+class NullOutputStream:
+    # Stand-in for sounddevice.OutputStream: drives the callback from a thread, without any audio device.
+    # Played blocks are kept in "blocks", so streaming playback can be checked on headless machines
+
+    # ---> CONSTRUCTOR
+    def __init__(self, samplerate, blocksize, channels, dtype, callback, finished_callback=None, realtime=False):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.realtime = realtime
+        self.blocks = []
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ---> FUNCTIONS
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        # Like sounddevice, an exception of the callback aborts the stream, then finished_callback is called
+        try:
+            while not self._stop_event.is_set():
+                outdata = np.empty((self.blocksize, self.channels), dtype=self.dtype)
+                self.callback(outdata, self.blocksize, None, None)
+                self.blocks.append(outdata)
+
+                if self.realtime:
+                    time.sleep(self.blocksize / self.samplerate)
+        finally:
+            if self.finished_callback is not None:
+                self.finished_callback()
+
+
 class MorseConverter:
     # ---> CONSTANTS
     FREQUENCY = 800  # Frequency of the beep in Hz
     SAMPLING_RATE = 44100  # Sample rate for the audio (CD quality)
+    INT16_SCALE = 32767  # Full scale of the int16 samples played and exported
+    CHUNK_SIZE = 4096  # Samples per chunk when streaming
+
+    SYNTHESIS_DTYPES = (np.dtype(np.int16), np.dtype(np.float32), np.dtype(np.float64))
+
+    PLAY_TIMEOUT_MARGIN = 10  # Seconds of playback allowed beyond the signal length, before giving up on the stream
+
+    PARALLEL_PIECES_PER_WORKER = 4  # Pieces of the morse text per worker, to balance uneven words
+
+    PLOT_BINS = 2000  # Columns of the plotted waveform, about one per pixel: any signal plots 2 * PLOT_BINS points
 
     # ---> ATTRIBUTES
-    duration_dot = 100 / 1000  # Duration of the beep in milliseconds
-    duration_dash = duration_dot * 3  # Duration of the beep in milliseconds
-    duration_pause = duration_dot * 7
+    # Shared by every converter: templates are keyed by tone and timing, so different settings can't collide
+    wave_templates = WaveTemplateCache()
+
+    # Default folder of the exported WAV files
+    export_dir = os.path.join(os.path.expanduser("~"), "Desktop", "MorseAudio")
 
     # ---> CONSTRUCTOR
-    def __init__(self):
-        with open("res/morse_alphabet.json", "r") as file:
-            json_content = json.load(file)
+    def __init__(self, export_dir=None, alphabet_path=None, timing=None, audio_cache=None, metrics=None,
+                 alphabet_cache_dir=None):
+        if export_dir is not None:
+            self.export_dir = export_dir
+
+        # Optional MorseAudioCache.AudioCache of the rendered int16 audio
+        self.audio_cache = audio_cache
+
+        # Optional MorseMetrics.MorseMetrics recording every stage, see get_stats
+        self.metrics = metrics or NullMetrics()
+
+        self._alphabet_path = alphabet_path
+        self._timing = timing or MorseTiming()
+
+        # Compiled once per process and shared, see MorseAlphabet.registry. With alphabet_cache_dir the compiled
+        # tables are also cached on disk, for the next processes
+        self._alphabet = get_alphabet(alphabet_path or ALPHABET_PATH, alphabet_cache_dir)
+
+        self._ddic_str_to_morse = self._alphabet.str_to_morse
+        self._ddic_morse_to_str = self._alphabet.morse_to_str
+        self._encode_char = self._alphabet.encode_char
+        self._decode_table = self._alphabet.decode_table
+
+    # ---> PROPERTIES
+    @property
+    def timing(self):
+        return self._timing
 
-            self._ddic_str_to_morse = json_content['morse_code']['str_to_morse']
-            self._ddic_morse_to_str = json_content['morse_code']['morse_to_str']
+    @property
+    def duration_dot(self):
+        return self._timing.duration_dot
+
+    @property
+    def duration_dash(self):
+        return self._timing.duration_dash
+
+    @property
+    def duration_pause(self):
+        return self._timing.duration_pause
 
     # ---> FUNCTIONS
     def get_ddic_str_to_morse(self):
@@ -39,119 +245,525 @@ class MorseConverter:
         return self._ddic_morse_to_str
 
     def string_to_morse(self, input_string):
+        # Each char becomes its code followed by a blank, a space is the '|' word gap, unknown chars are a blank
+        # TODO implement special chars
+        # Encoding a short text takes less than a no-op stage, so the stage is skipped when metrics are disabled
+        if not self.metrics.enabled:
+            return ''.join(map(self._encode_char, input_string.upper().strip())).strip()
 
-        string_to_morse = input_string
-        string_to_morse = string_to_morse.upper()
-        string_to_morse = string_to_morse.strip()
+        with self.metrics.stage("encode", chars=len(input_string)):
+            return ''.join(map(self._encode_char, input_string.upper().strip())).strip()
 
-        # TODO implement special chars
-        morse_text = ""
-        for char in string_to_morse.upper():
-            if char == ' ':
-                morse_text += '|'
-            else:
-                if char in self._ddic_str_to_morse['chars']:
-                    morse_text += self._ddic_str_to_morse['chars'][char]
+    def encode_many(self, input_strings):
+        # Lazily encode many strings, sharing the lookups across all of them
+        encode_char = self._encode_char
+        for input_string in input_strings:
+            yield ''.join(map(encode_char, input_string.upper().strip())).strip()
 
-                elif char in self._ddic_str_to_morse['digits']:
-                    morse_text += self._ddic_str_to_morse['digits'][char]
+    def morse_to_string(self, input_morse, errors="replace", replacement="\ufffd"):
+        # input_morse can be a whole morse text or an iterable of its fragments
+        if isinstance(input_morse, str):
+            input_morse = (input_morse,)
 
-                elif char in self._ddic_str_to_morse['punctuation_marks']:
-                    morse_text += self._ddic_str_to_morse['punctuation_marks'][char]
+        with self.metrics.stage("decode") as stage:
+            text = ''.join(self.iter_morse_to_string(input_morse, errors, replacement))
+            stage.add(chars=len(text))
 
-                else:
-                    morse_text += ' '
+        return text
 
-            morse_text += ' '
+    def iter_morse_to_string(self, morse_fragments, errors="replace", replacement="\ufffd"):
+        # Decode the fragments as they come, yielding the text of every completed code.
+        # Only the trailing partial code of a fragment is carried over, so earlier input is never scanned again.
+        # Unknown codes are replaced with replacement, skipped ("ignore") or raise a ValueError ("strict")
+        if errors not in ("strict", "replace", "ignore"):
+            raise ValueError(f"Invalid errors value: {errors}")
 
-        return morse_text.strip()
+        decode_table = self._decode_table
+        pending = ""
 
-    def morse_to_string(self, input_morse):
-        # TODO morse to string
-        pass
+        for fragment in morse_fragments:
+            fragment = pending + normalize_morse(fragment)
+            codes = fragment.split()
 
-    def play_sound(self, all_notes):
-        if len(all_notes) > 0:
-            sd.play(all_notes, self.SAMPLING_RATE)
-            sd.wait()
+            # The last code may continue in the next fragment
+            pending = codes.pop() if codes and not fragment[-1].isspace() else ""
 
-    @staticmethod
-    def print_plot(all_notes):
-        if len(all_notes) > 0:
-            plt.plot(all_notes)
-            plt.xlabel('Sample')
-            plt.ylabel('Amplitude')
-            plt.title('Audio Waveform')
-            plt.show()
+            text = self._decode_codes(codes, decode_table, errors, replacement)
+            if text:
+                yield text
 
-    def export_file(self, all_notes):
-        if all_notes:
-            sound_name = f'morse_{time.time()}.wav'
+        if pending:
+            yield self._decode_codes((pending,), decode_table, errors, replacement)
 
-            out_folder = os.path.join(os.path.join(os.environ['USERPROFILE']), 'Desktop')
-            out_folder = out_folder + '\\MorseAudio\\'
-            if not os.path.isdir(out_folder):
-                os.makedirs(out_folder)
+    @staticmethod
+    def _decode_codes(codes, decode_table, errors, replacement):
+        if errors == "replace":
+            return ''.join([decode_table.get(code, replacement) for code in codes])
+
+        chars = []
+        for code in codes:
+            char = decode_table.get(code)
+            if char is None:
+                if errors == "strict":
+                    raise ValueError(f"Unknown morse code: {code}")
+
+                # Ignored
+                continue
+
+            chars.append(char)
+
+        return ''.join(chars)
+
+    def audio_to_morse(self, samples, sampling_rate=None, word_gap_units=None):
+        decoder = MorseAudioDecoder(self.FREQUENCY, sampling_rate or self.SAMPLING_RATE, self.duration_dot,
+                                    word_gap_units)
+        with self.metrics.stage("decode_audio", samples=len(samples)):
+            return decoder.decode_samples(samples)
+
+    def wav_to_morse(self, source):
+        # source can be a path, which is memory mapped, or a binary file-like object
+        sampling_rate, samples = read_wav(source)
+        return self.audio_to_morse(samples, sampling_rate)
+
+    def wav_to_string(self, source, errors="replace", replacement="\ufffd"):
+        return self.morse_to_string(self.wav_to_morse(source), errors, replacement)
+
+    def create_stream_decoder(self, replacement="\ufffd", word_gap_units=None):
+        return MorseStreamDecoder(self.FREQUENCY, self.SAMPLING_RATE, self.duration_dot, self._decode_table,
+                                  replacement, word_gap_units)
+
+    def listen(self, on_text, stop_event, blocksize=None, stream_factory=None, decoder=None):
+        # Decode live audio until stop_event is set, calling on_text with the text as soon as it is decoded.
+        # The input stream callback only queues the blocks, decoding runs on the calling thread.
+        # stream_factory builds the input stream, sounddevice.InputStream by default
+        blocksize = blocksize or self.CHUNK_SIZE
+        stream_factory = stream_factory or _get_sounddevice().InputStream
+        decoder = decoder or self.create_stream_decoder()
+
+        blocks = queue.Queue()
+
+        def callback(indata, frames, time_info, status):
+            blocks.put(indata[:, 0].copy())
+
+        stream = stream_factory(samplerate=self.SAMPLING_RATE, blocksize=blocksize, channels=1,
+                                dtype='float32', callback=callback)
+        with stream:
+            while not stop_event.is_set():
+                try:
+                    block = blocks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                text = decoder.feed(block)
+                if text:
+                    on_text(text)
+
+        text = decoder.flush()
+        if text:
+            on_text(text)
+
+        return decoder
 
-            out_path = out_folder + sound_name
-            wavfile.write(out_path, self.SAMPLING_RATE, all_notes)
+    def play_sound(self, all_notes):
+        if len(all_notes) > 0:
+            sd = _get_sounddevice()
+            with self.metrics.stage("play", samples=len(all_notes)):
+                sd.play(all_notes, self.SAMPLING_RATE)
+                sd.wait()
+
+    def play_stream(self, morse_text, chunk_size=None, stop_event=None, stream_factory=None, on_progress=None):
+        # Play the signal while it is synthesized: the output stream callback pulls one chunk at a time.
+        # stream_factory builds the output stream (sounddevice.OutputStream by default, NullOutputStream for tests)
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        stream_factory = stream_factory or _get_sounddevice().OutputStream
+
+        samples_count = self.get_samples_count(morse_text)
+        chunks = self._track_chunks(self.iter_audio_chunks(morse_text, chunk_size), samples_count, stop_event,
+                                    on_progress)
+        pending = np.zeros(0, dtype=np.int16)
+        finished = threading.Event()
+        ended = False
+        callback_error = None
+
+        def callback(outdata, frames, time_info, status):
+            nonlocal pending, ended, callback_error
+
+            filled = 0
+            try:
+                while filled < frames and not finished.is_set():
+                    if len(pending) == 0:
+                        pending = next(chunks, None)
+                        if pending is None:
+                            ended = True
+                            finished.set()
+                            break
+
+                    step = min(frames - filled, len(pending))
+                    outdata[filled:filled + step, 0] = pending[:step]
+                    pending = pending[step:]
+                    filled += step
+
+            except Exception as error:
+                # An exception would only kill the audio thread: it is raised again by play_stream
+                callback_error = error
+                finished.set()
+
+            # Pad the last block with silence
+            outdata[filled:] = 0
+
+        # finished_callback wakes up play_stream even when the stream is aborted by the device
+        stream = stream_factory(samplerate=self.SAMPLING_RATE, blocksize=chunk_size, channels=1,
+                                dtype='int16', callback=callback, finished_callback=finished.set)
+        with self.metrics.stage("play_stream", samples=samples_count), stream:
+            if not finished.wait(samples_count / self.SAMPLING_RATE + self.PLAY_TIMEOUT_MARGIN):
+                raise TimeoutError("The output stream stopped pulling audio")
+
+        if callback_error is not None:
+            raise callback_error
+
+        if not ended and not (stop_event is not None and stop_event.is_set()):
+            raise RuntimeError("The output stream was aborted before the end of the signal")
+
+    def print_plot(self, all_notes, block=True, timeline=None, out_path=None, bins=None):
+        # Plot the min/max envelope of the signal, see get_plot_envelope, with the keying of timeline (a morse text
+        # or a MorseTimeline) below it. With out_path the figure is saved there without opening any window
+        if len(all_notes) == 0:
+            return None
+
+        with self.metrics.stage("plot", samples=len(all_notes)):
+            if out_path is None:
+                figure = _get_pyplot().figure()
+            else:
+                figure = _get_figure_class()(figsize=(12, 4))
 
-            subprocess.Popen(f'explorer {out_folder}"')
+            self._draw_plot(figure, all_notes, timeline, bins or self.PLOT_BINS)
 
-    def _get_signal_wave(self, duration):
-        # Generate time for temporal axis of signal
-        t = np.linspace(0, duration, int(self.SAMPLING_RATE * duration), endpoint=False)
+            if out_path is None:
+                _get_pyplot().show(block=block)
+            else:
+                figure.savefig(out_path)
 
-        # Generate sine wave for signal
-        signal_wave = 0.5 * np.sin(2 * np.pi * self.FREQUENCY * t)
-        return signal_wave
+        return figure
 
-    def _get_silence_wave(self, duration):
-        # Generate time for temporal axis of signal
-        t_silence = np.linspace(0, duration, int(self.SAMPLING_RATE * duration), endpoint=False)
+    def _draw_plot(self, figure, all_notes, timeline, bins):
+        x, y = self.get_plot_envelope(all_notes, bins)
 
-        # Generate sine wave for signal
-        silence_wave = np.zeros_like(t_silence)  # Silence Wave
-        return silence_wave
+        if timeline is None:
+            wave_axes = figure.subplots()
+        else:
+            wave_axes, key_axes = figure.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': (4, 1)})
 
-    def morse_process(self, morse_text, play_sound=False, print_plot=False, export_file=False):
+            edges, duty = self.get_plot_keying(timeline, len(all_notes), bins)
+            key_axes.stairs(duty, edges, fill=True, linewidth=0)
+            key_axes.set_ylim(0, 1.05)
+            key_axes.set_yticks(())
+            key_axes.set_ylabel('Key')
+            key_axes.set_xlabel('Sample')
 
-        morse_audio = np.array([])
+        wave_axes.plot(x, y, linewidth=0.5)
+        wave_axes.set_xlim(0, len(all_notes))
+        wave_axes.set_ylabel('Amplitude')
+        wave_axes.set_title('Audio Waveform')
+        if timeline is None:
+            wave_axes.set_xlabel('Sample')
 
-        # Start the signal with a Silence Wave
-        silence_wave = self._get_silence_wave(self.duration_dash)
-        morse_audio = np.concatenate((morse_audio, silence_wave))
+        figure.tight_layout()
 
-        for char in morse_text:
-            match char:
-                case ".":
-                    duration = self.duration_dot
-                    signal_wave = self._get_signal_wave(duration)
-                    morse_audio = np.concatenate((morse_audio, signal_wave))
+    @staticmethod
+    def get_plot_envelope(all_notes, bins):
+        # Min/max decimation: the samples are split in bins columns and each one is drawn as a vertical stroke from
+        # its min to its max, which looks the same as the full signal but plots at most 2 * bins points.
+        # Signals of up to 2 * bins samples are returned as they are
+        all_notes = np.asarray(all_notes)
+        samples_count = len(all_notes)
+        if samples_count <= 2 * bins:
+            return np.arange(samples_count), all_notes
+
+        bin_size = -(-samples_count // bins)
+        full_count = samples_count - samples_count % bin_size
+        columns = all_notes[:full_count].reshape(-1, bin_size)
+        mins, maxs = columns.min(axis=1), columns.max(axis=1)
+
+        if full_count < samples_count:
+            tail = all_notes[full_count:]
+            mins, maxs = np.append(mins, tail.min()), np.append(maxs, tail.max())
+
+        x = np.repeat(np.arange(len(mins)) * bin_size, 2)
+        y = np.stack((mins, maxs), axis=1).ravel()
+        return x, y
+
+    def get_plot_keying(self, timeline, samples_count, bins):
+        # Fraction of key down samples in each of bins columns, from the timeline only: columns narrower than a dot
+        # show every element, wider ones show the density of the keying. Returns (edges, duty) for Axes.stairs
+        timeline = self.get_timeline(timeline)
+        edges = np.linspace(0, samples_count, min(bins, max(samples_count, 1)) + 1).astype(np.int64)
+
+        if len(timeline) == 0:
+            return edges, np.zeros(len(edges) - 1)
+
+        counts = timeline.get_samples_counts(self.SAMPLING_RATE, self.duration_dot)
+        ends = np.cumsum(counts)
+        key_down_ends = np.cumsum(counts * timeline.key_down)
+
+        # Key down samples before each edge: the events ended before it, plus the part of the event across it
+        event = np.minimum(np.searchsorted(ends, edges, side='right'), len(counts) - 1)
+        starts = ends[event] - counts[event]
+        key_down_before = key_down_ends[event] - counts[event] * timeline.key_down[event]
+        key_down = key_down_before + np.clip(edges - starts, 0, counts[event]) * timeline.key_down[event]
+
+        duty = np.diff(key_down) / np.maximum(np.diff(edges), 1)
+        return edges, duty
+
+    def export_file(self, all_notes, target=None):
+        # all_notes can be int16 samples, or a float signal in [-0.5, 0.5] like the one returned by morse_process,
+        # which is scaled chunk by chunk exactly like synthesize scales its int16 templates
+        if len(all_notes) > 0:
+            all_notes = np.asarray(all_notes)
+            is_float = np.issubdtype(all_notes.dtype, np.floating)
+            if not (is_float or np.issubdtype(all_notes.dtype, np.integer)):
+                raise ValueError(f"Invalid samples dtype: {all_notes.dtype}, expected int16 or a float signal")
+
+            chunk_size = self.CHUNK_SIZE
+            chunks = (all_notes[start:start + chunk_size] for start in range(0, len(all_notes), chunk_size))
+            if is_float:
+                chunks = map(self._float_to_int16, chunks)
+
+            with self.metrics.stage("export", samples=len(all_notes), bytes=all_notes.nbytes):
+                return self._write_wav(chunks, len(all_notes), target)
+
+    def _float_to_int16(self, chunk):
+        return np.clip(chunk * self.INT16_SCALE, -32768, 32767).astype(np.int16)
+
+    def export_wav(self, morse_text, target=None, chunk_size=None, stop_event=None, on_progress=None):
+        # Stream the synthesized chunks straight to the WAV file: memory stays flat for any message length.
+        # The frames count is known upfront, so the header is already right and target doesn't need to be seekable
+        samples_count = self.get_samples_count(morse_text)
+        chunks = self._track_chunks(self.iter_audio_chunks(morse_text, chunk_size), samples_count, stop_event,
+                                    on_progress)
+        with self.metrics.stage("export_wav", samples=samples_count, bytes=samples_count * 2):
+            return self._write_wav(chunks, samples_count, target)
 
-                case "-":
-                    duration = self.duration_dash
-                    signal_wave = self._get_signal_wave(duration)
-                    morse_audio = np.concatenate((morse_audio, signal_wave))
+    @staticmethod
+    def _track_chunks(chunks, samples_count, stop_event=None, on_progress=None):
+        # Stop the chunks as soon as stop_event is set, reporting (samples done, samples count) to on_progress
+        samples_done = 0
+        for chunk in chunks:
+            if stop_event is not None and stop_event.is_set():
+                return
+
+            yield chunk
+
+            samples_done += len(chunk)
+            if on_progress is not None:
+                on_progress(samples_done, samples_count)
+
+    def _write_wav(self, chunks, frames_count, target):
+        # target can be a path or a binary file-like object, by default a new file is created in export_dir
+        open_folder = target is None
+        if target is None:
+            if not os.path.isdir(self.export_dir):
+                os.makedirs(self.export_dir, exist_ok=True)
+
+            target = os.path.join(self.export_dir, f'morse_{time.time()}.wav')
+
+        with wave.open(target, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.SAMPLING_RATE)
+            wav_file.setnframes(frames_count)
+
+            # If less frames than expected are written, the header sizes are patched on close
+            for chunk in chunks:
+                wav_file.writeframesraw(np.ascontiguousarray(chunk, dtype='<i2'))
+
+        if open_folder and sys.platform == "win32":
+            subprocess.Popen(['explorer', self.export_dir])
+
+        return target
+
+    def _get_samples_count(self, duration):
+        return int(self.SAMPLING_RATE * duration)
+
+    def _build_signal_wave(self, duration, dtype):
+        samples_count = self._get_samples_count(duration)
+        with self.metrics.stage("template", samples=samples_count, bytes=samples_count * np.dtype(dtype).itemsize):
+            # Generate time for temporal axis of signal
+            t = np.linspace(0, duration, samples_count, endpoint=False)
+
+            # Generate sine wave for signal
+            signal_wave = 0.5 * np.sin(2 * np.pi * self.FREQUENCY * t)
+            if np.issubdtype(dtype, np.integer):
+                signal_wave = signal_wave * self.INT16_SCALE
+
+            return signal_wave.astype(dtype, copy=False)
+
+    def _get_signal_wave(self, duration, dtype=np.float64):
+        key = ("signal", self.FREQUENCY, self.SAMPLING_RATE, duration, np.dtype(dtype).str)
+        return self.wave_templates.get(key, lambda: self._build_signal_wave(duration, dtype))
+
+    def get_timeline(self, morse_text):
+        # Keying events of the signal, see MorseTimeline: every rendering starts from here
+        if isinstance(morse_text, MorseTimeline):
+            return morse_text
+
+        return MorseTimeline.from_morse(morse_text)
+
+    def get_samples_count(self, morse_text):
+        if isinstance(morse_text, MorseTimeline):
+            return morse_text.get_samples_count(self.SAMPLING_RATE, self.duration_dot)
+
+        # Same count of the timeline events, without building them
+        dot_samples = self._get_samples_count(self.duration_dot)
+        dash_samples = self._get_samples_count(self.duration_dash)
+        pause_samples = self._get_samples_count(self.duration_pause)
+
+        dashes_count = morse_text.count('-') + morse_text.count('_') + morse_text.count(' ')
+        return (2 * dash_samples + morse_text.count('.') * dot_samples + dashes_count * dash_samples
+                + morse_text.count('|') * pause_samples + len(morse_text) * dot_samples)
+
+    def get_duration(self, morse_text):
+        # Length of the signal in seconds, without rendering it
+        return self.get_samples_count(morse_text) / self.SAMPLING_RATE
+
+    def _render_timeline(self, timeline, morse_audio, offset=0):
+        # Write the key down events of the timeline in morse_audio from offset on: silences are expected to be
+        # already zero. Durations are dot multiples like the converter's own, so templates are shared
+        samples_counts = timeline.get_samples_counts(self.SAMPLING_RATE, self.duration_dot)
+        starts = offset + np.cumsum(samples_counts) - samples_counts
+
+        key_down = timeline.key_down
+        for start, units, samples_count in zip(starts[key_down].tolist(), timeline.units[key_down].tolist(),
+                                               samples_counts[key_down].tolist()):
+            morse_audio[start:start + samples_count] = self._get_signal_wave(self.duration_dot * units,
+                                                                             morse_audio.dtype)
+
+        return offset + int(samples_counts.sum())
+
+    def iter_audio_chunks(self, morse_text, chunk_size=None, dtype=np.int16, use_cache=True):
+        # Yield the signal as fixed size chunks (the last one may be shorter), so memory stays flat
+        # regardless of the message length and the first chunk is ready as soon as it is filled.
+        # The audio_cache is only read: a hit is handed out as views, a miss is streamed and copied in the cache
+        # once complete, only if the signal fits its memory budget. use_cache False bypasses it
+        chunk_size = chunk_size or self.CHUNK_SIZE
+
+        if not (use_cache and self.audio_cache is not None and np.dtype(dtype) == np.int16
+                and not isinstance(morse_text, MorseTimeline)):
+            yield from self._iter_rendered_chunks(morse_text, chunk_size, dtype)
+            return
+
+        key = self.audio_cache.make_key(morse_text, self.FREQUENCY, self.SAMPLING_RATE, self.duration_dot)
+        all_notes = self.audio_cache.get(key)
+        if all_notes is not None:
+            for start in range(0, len(all_notes), chunk_size):
+                yield all_notes[start:start + chunk_size]
+
+            return
+
+        samples_count = self.get_samples_count(morse_text)
+        if samples_count * 2 > self.audio_cache.memory_budget:
+            yield from self._iter_rendered_chunks(morse_text, chunk_size, dtype)
+            return
+
+        # Chunks are fresh arrays, so the copy only costs the cached signal itself
+        all_notes = np.empty(samples_count, dtype=np.int16)
+        filled = 0
+        for chunk in self._iter_rendered_chunks(morse_text, chunk_size, dtype):
+            all_notes[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            yield chunk
+
+        # Only reached when the chunks are consumed to the end
+        all_notes.flags.writeable = False
+        self.audio_cache.put(key, all_notes)
+
+    def _iter_rendered_chunks(self, morse_text, chunk_size, dtype):
+        chunk = np.zeros(chunk_size, dtype=dtype)
+        filled = 0
+
+        for key_down, units in self.get_timeline(morse_text):
+            duration = self.duration_dot * units
+            samples_count = self._get_samples_count(duration)
+            signal_wave = self._get_signal_wave(duration, dtype) if key_down else None
+
+            start = 0
+            while start < samples_count:
+                step = min(chunk_size - filled, samples_count - start)
+                if signal_wave is not None:
+                    chunk[filled:filled + step] = signal_wave[start:start + step]
+
+                filled += step
+                start += step
+
+                if filled == chunk_size:
+                    yield chunk
+                    chunk = np.zeros(chunk_size, dtype=dtype)
+                    filled = 0
+
+        if filled > 0:
+            yield chunk[:filled]
+
+    def render_audio(self, morse_text):
+        # int16 signal of the morse text, served by audio_cache when there is one (timelines aren't cached)
+        if self.audio_cache is None or isinstance(morse_text, MorseTimeline):
+            return self.synthesize(morse_text, np.int16)
+
+        key = self.audio_cache.make_key(morse_text, self.FREQUENCY, self.SAMPLING_RATE, self.duration_dot)
+        all_notes = self.audio_cache.get(key)
+        if all_notes is None:
+            # The fresh signal is handed over to the cache: read-only, it is stored without a copy
+            all_notes = self.synthesize(morse_text, np.int16)
+            all_notes.flags.writeable = False
+            all_notes = self.audio_cache.put(key, all_notes)
+
+        return all_notes
+
+    def synthesize(self, morse_text, dtype=np.float64, workers=None, executor="thread"):
+        # Render the signal straight into a buffer of dtype, without intermediate arrays: floats are in [-0.5, 0.5],
+        # int16 templates are scaled like the float signal, so they match np.int16(morse_audio * INT16_SCALE)
+        dtype = np.dtype(dtype)
+        if dtype not in self.SYNTHESIS_DTYPES:
+            raise ValueError(f"Invalid dtype: {dtype}, expected one of {', '.join(map(str, self.SYNTHESIS_DTYPES))}")
+
+        with self.metrics.stage(f"synthesize_{dtype.name}") as stage:
+            if workers is not None and workers > 1:
+                morse_audio = self._render_parallel(morse_text, workers, executor, dtype)
+            else:
+                # The exact samples count is known upfront, so the whole signal is written in a single buffer.
+                # Silence segments are already zero and only need to be skipped
+                timeline = self.get_timeline(morse_text)
+                morse_audio = np.zeros(self.get_samples_count(timeline), dtype=dtype)
+                self._render_timeline(timeline, morse_audio)
 
-                case " ":
-                    duration = self.duration_dash
-                    silence_wave = self._get_silence_wave(duration)
-                    morse_audio = np.concatenate((morse_audio, silence_wave))
+            stage.add(samples=len(morse_audio), bytes=morse_audio.nbytes)
 
-                case "|":
-                    duration = self.duration_pause
-                    silence_wave = self._get_silence_wave(duration)
-                    morse_audio = np.concatenate((morse_audio, silence_wave))
+        return morse_audio
 
-            silence_wave = self._get_silence_wave(self.duration_dot)
-            morse_audio = np.concatenate((morse_audio, silence_wave))
+    def morse_process(self, morse_text, play_sound=False, print_plot=False, export_file=False, workers=None,
+                      executor="thread", dtype=np.float64, return_audio=True):
+        # Returns the signal as dtype (None if return_audio is False), while play, plot and export use int16.
+        # With dtype int16 a single buffer serves both, with return_audio False only the int16 one is rendered
+        with self.metrics.stage("morse_process"):
+            return self._morse_process(morse_text, play_sound, print_plot, export_file, workers, executor,
+                                       np.dtype(dtype), return_audio)
+
+    def _morse_process(self, morse_text, play_sound, print_plot, export_file, workers, executor, dtype,
+                       return_audio):
+        morse_audio = None
+        if return_audio:
+            if dtype == np.int16 and self.audio_cache is not None and not workers:
+                morse_audio = self.render_audio(morse_text)
+            else:
+                morse_audio = self.synthesize(morse_text, dtype, workers, executor)
 
-        # End the signal with a Silence Wave
-        silence_wave = self._get_silence_wave(self.duration_dash)
-        morse_audio = np.concatenate((morse_audio, silence_wave))
+        if not (play_sound or print_plot or export_file):
+            return morse_audio
 
-        all_notes = np.int16(morse_audio * 32767)
+        if morse_audio is not None and morse_audio.dtype == np.int16:
+            all_notes = morse_audio
+        elif self.audio_cache is not None:
+            all_notes = self.render_audio(morse_text)
+        else:
+            all_notes = self.synthesize(morse_text, np.int16, workers, executor)
 
         if play_sound:
             self.play_sound(all_notes)
@@ -164,6 +776,89 @@ class MorseConverter:
 
         return morse_audio
 
+    def get_stats(self):
+        # Stages recorded by the metrics, with the statistics of the caches, e.g. for an external monitoring
+        stats = self.metrics.get_stats()
+        stats["caches"] = {"wave_templates": self.wave_templates.get_stats()}
+        if self.audio_cache is not None:
+            stats["caches"]["audio_cache"] = self.audio_cache.get_stats()
+
+        return stats
+
+    def _split_timeline(self, timeline, pieces_count):
+        # Cut the timeline right after the word gaps closest to equal sized pieces,
+        # returning (sample offset, piece) for each piece
+        word_gap_ends = np.flatnonzero(~timeline.key_down & (timeline.units == 7)) + 1
+        targets = np.arange(1, pieces_count) * len(timeline) // pieces_count
+        cuts = word_gap_ends[np.minimum(np.searchsorted(word_gap_ends, targets), len(word_gap_ends) - 1)] \
+            if len(word_gap_ends) > 0 else np.zeros(0, dtype=np.int64)
+        bounds = np.unique(np.concatenate(([0], cuts, [len(timeline)])))
+
+        samples_counts = timeline.get_samples_counts(self.SAMPLING_RATE, self.duration_dot)
+        offsets = np.concatenate(([0], np.cumsum(samples_counts)))
+
+        return [(int(offsets[start]), timeline[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def _render_parallel(self, morse_text, workers, executor, dtype):
+        # Render the pieces of the timeline concurrently, each one at its exact sample offset, so the result
+        # matches the serial rendering sample for sample.
+        # Threads write straight into the output buffer. Processes write into a shared memory block instead,
+        # which is copied once into the returned array
+        timeline = self.get_timeline(morse_text)
+        samples_count = self.get_samples_count(timeline)
+        pieces = self._split_timeline(timeline, workers * self.PARALLEL_PIECES_PER_WORKER)
+
+        match executor:
+            case "thread":
+                morse_audio = np.zeros(samples_count, dtype=dtype)
+                with ThreadPoolExecutor(workers) as pool:
+                    list(pool.map(lambda item: self._render_timeline(item[1], morse_audio, item[0]), pieces))
+
+                return morse_audio
+
+            case "process":
+                shared_block = shared_memory.SharedMemory(create=True, size=max(1, samples_count * dtype.itemsize))
+                try:
+                    shared_audio = np.ndarray(samples_count, dtype=dtype, buffer=shared_block.buf)
+                    shared_audio[:] = 0
+
+                    tasks = [(shared_block.name, samples_count, dtype.str, offset, piece, type(self),
+                              self._alphabet_path, self._timing) for offset, piece in pieces]
+                    with ProcessPoolExecutor(workers) as pool:
+                        list(pool.map(_render_shared_piece, tasks))
+
+                    morse_audio = shared_audio.copy()
+                    del shared_audio
+                finally:
+                    shared_block.close()
+                    shared_block.unlink()
+
+                return morse_audio
+
+            case _:
+                raise ValueError(f"Invalid executor: {executor}")
+
+
+# Converters of the worker processes, one for each (class, alphabet, timing)
+_worker_converters = {}
+
+
+def _render_shared_piece(task):
+    shared_name, samples_count, dtype, offset, piece, converter_class, alphabet_path, timing = task
+
+    converter = _worker_converters.get((converter_class, alphabet_path, timing))
+    if converter is None:
+        converter = converter_class(alphabet_path=alphabet_path, timing=timing)
+        _worker_converters[(converter_class, alphabet_path, timing)] = converter
+
+    shared_block = shared_memory.SharedMemory(name=shared_name)
+    try:
+        shared_audio = np.ndarray(samples_count, dtype=dtype, buffer=shared_block.buf)
+        converter._render_timeline(piece, shared_audio, offset)
+        del shared_audio
+    finally:
+        shared_block.close()
+
 
 if __name__ == "__main__":
     mc = MorseConverter()
@@ -0,0 +1,264 @@
+####################################################################################################################
+# IMPORTS
+import argparse
+import json
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from MorseConverter import MorseConverter
+from MorseTimeline import MorseTimeline
+
+
+####################################################################################################################
+# CONSTANTS
+LAYOUTS = ("ragged", "padded")
+BLOCK_SAMPLES = 1 << 22  # Samples rendered by a single vectorized pass, which bounds the temporary arrays
+
+
+####################################################################################################################
+# CORE
+class DatasetConfig(NamedTuple):
+    # Every row draws its text and its rendering parameters uniformly in these ranges, from the seed only
+    seed: int = 0
+    sampling_rate: int = 8000
+    duration_dot_range: tuple = (0.04, 0.12)  # About 30 down to 10 words per minute
+    frequency_range: tuple = (500.0, 1000.0)
+    amplitude_range: tuple = (0.2, 0.9)
+    noise_range: tuple = (0.0, 0.3)  # Standard deviation of the white noise added to the whole clip
+    words_range: tuple = (1, 3)
+    word_length_range: tuple = (1, 6)
+    layout: str = "ragged"
+    dtype: str = "float32"
+
+
+def render_batch(morse_texts, duration_dots=0.1, frequencies=MorseConverter.FREQUENCY, amplitudes=0.5,
+                 noise_levels=0.0, sampling_rate=MorseConverter.SAMPLING_RATE, layout="ragged", dtype=np.float32,
+                 rng=None):
+    # Render many morse texts together. Every parameter is a scalar or one value per row; noise is drawn from rng
+    # (a seeded np.random.Generator). Rows are keyed like MorseConverter keys its signal, so a row with the default
+    # parameters and no noise matches MorseConverter.synthesize sample for sample.
+    # Returns (audio, offsets) for the ragged layout, row i being audio[offsets[i]:offsets[i + 1]], or
+    # (audio, lengths) for the padded one, a zero padded (rows, longest row) array
+    if layout not in LAYOUTS:
+        raise ValueError(f"Invalid layout: {layout}, expected one of {', '.join(LAYOUTS)}")
+
+    timelines = [MorseTimeline.from_morse(morse_text) for morse_text in morse_texts]
+    rows_count = len(timelines)
+
+    duration_dots, frequencies, amplitudes, noise_levels = (
+        np.broadcast_to(np.asarray(values, dtype=np.float64), rows_count)
+        for values in (duration_dots, frequencies, amplitudes, noise_levels))
+
+    if noise_levels.any() and rng is None:
+        raise ValueError("Noise needs a seeded rng")
+
+    # Every event of every row, with the index of its row
+    timeline = MorseTimeline.concatenate(timelines)
+    event_rows = np.repeat(np.arange(rows_count), [len(row_timeline) for row_timeline in timelines])
+    counts = timeline.get_samples_counts(sampling_rate, duration_dots[event_rows])
+
+    row_event_counts = np.bincount(event_rows, minlength=rows_count)
+    lengths = np.bincount(event_rows, weights=counts, minlength=rows_count).astype(np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+    if layout == "ragged":
+        audio = np.zeros(offsets[-1], dtype=dtype)
+        row_starts = offsets[:-1]
+    else:
+        row_length = int(lengths.max()) if rows_count else 0
+        audio = np.zeros((rows_count, row_length), dtype=dtype)
+        row_starts = np.arange(rows_count) * row_length
+
+    flat_audio = audio.reshape(-1)
+    event_starts = np.cumsum(counts) - counts - offsets[event_rows] + row_starts[event_rows]
+
+    # Groups of whole rows of up to BLOCK_SAMPLES samples (a longer row makes a group on its own)
+    group_starts = [0]
+    group_samples = 0
+    for row, length in enumerate(lengths.tolist()):
+        if group_samples and group_samples + length > BLOCK_SAMPLES:
+            group_starts.append(row)
+            group_samples = 0
+
+        group_samples += length
+
+    event_bounds = np.concatenate(([0], np.cumsum(row_event_counts)))
+    for first_row, end_row in zip(group_starts, group_starts[1:] + [rows_count]):
+        group = slice(event_bounds[first_row], event_bounds[end_row])
+        _render_events(flat_audio, timeline.key_down[group], timeline.units[group], counts[group],
+                       event_starts[group], event_rows[group], duration_dots, frequencies, amplitudes)
+
+        for row in range(first_row, end_row):
+            if noise_levels[row] > 0:
+                row_audio = flat_audio[row_starts[row]:row_starts[row] + lengths[row]]
+                row_audio += (noise_levels[row] * rng.standard_normal(lengths[row])).astype(dtype, copy=False)
+
+    if layout == "ragged":
+        return audio, offsets
+
+    return audio, lengths
+
+
+def _render_events(flat_audio, key_down, units, counts, event_starts, event_rows, duration_dots, frequencies,
+                   amplitudes):
+    # Vectorized form of MorseConverter._build_signal_wave over all the key down events: the tone restarts with
+    # every element, t being the sample index times duration / samples count, like np.linspace does
+    key_down_counts = counts[key_down]
+    if key_down_counts.sum() == 0:
+        return
+
+    rows = event_rows[key_down]
+    durations = duration_dots[rows] * units[key_down]
+    steps = durations / np.maximum(key_down_counts, 1)
+
+    sample_starts = np.cumsum(key_down_counts) - key_down_counts
+    within = np.arange(int(key_down_counts.sum())) - np.repeat(sample_starts, key_down_counts)
+    t = within * np.repeat(steps, key_down_counts)
+
+    signal_wave = np.repeat(amplitudes[rows], key_down_counts) * np.sin(
+        2 * np.pi * np.repeat(frequencies[rows], key_down_counts) * t)
+    flat_audio[np.repeat(event_starts[key_down], key_down_counts) + within] = signal_wave
+
+
+def make_texts(rng, rows_count, symbols, config):
+    # Random words of the alphabet symbols
+    texts = []
+    for words_count in rng.integers(config.words_range[0], config.words_range[1] + 1, rows_count):
+        lengths = rng.integers(config.word_length_range[0], config.word_length_range[1] + 1, words_count)
+        picks = rng.integers(0, len(symbols), int(lengths.sum()))
+        word_starts = np.cumsum(lengths) - lengths
+        texts.append(" ".join(''.join(symbols[pick] for pick in picks[start:start + length])
+                              for start, length in zip(word_starts, lengths)))
+
+    return texts
+
+
+def draw_parameters(rng, rows_count, config):
+    # (duration_dots, frequencies, amplitudes, noise_levels) of the rows
+    return tuple(rng.uniform(low, high, rows_count) for low, high in (
+        config.duration_dot_range, config.frequency_range, config.amplitude_range, config.noise_range))
+
+
+# Converter of the worker process, only used to encode the texts
+_worker_converter = None
+
+
+def write_shard(out_dir, shard_index, rows_count, config):
+    # Runs in the worker: a shard depends only on (seed, shard_index), so it is the same for any worker count.
+    # Writes shard_NNNNN.npy (ragged audio or padded rows), its .offsets.npy or .lengths.npy and the
+    # .jsonl labels, every file written then renamed. Returns the shard summary of the index
+    global _worker_converter
+    if _worker_converter is None:
+        _worker_converter = MorseConverter()
+
+    cpu_start = time.process_time()
+    rng = np.random.default_rng([config.seed, shard_index])
+
+    ddic_str_to_morse = _worker_converter.get_ddic_str_to_morse()
+    symbols = sorted(ddic_str_to_morse['chars']) + sorted(ddic_str_to_morse['digits'])
+
+    texts = make_texts(rng, rows_count, symbols, config)
+    morse_texts = list(_worker_converter.encode_many(texts))
+    duration_dots, frequencies, amplitudes, noise_levels = draw_parameters(rng, rows_count, config)
+
+    audio, row_index = render_batch(morse_texts, duration_dots, frequencies, amplitudes, noise_levels,
+                                    config.sampling_rate, config.layout, np.dtype(config.dtype), rng)
+    lengths = np.diff(row_index) if config.layout == "ragged" else row_index
+
+    name = f"shard_{shard_index:05d}"
+    index_suffix = "offsets" if config.layout == "ragged" else "lengths"
+    _save_atomic(os.path.join(out_dir, f"{name}.npy"), audio)
+    _save_atomic(os.path.join(out_dir, f"{name}.{index_suffix}.npy"), row_index)
+
+    labels_path = os.path.join(out_dir, f"{name}.jsonl")
+    with open(f"{labels_path}.tmp", "w", encoding="utf-8") as file:
+        for row in range(rows_count):
+            file.write(json.dumps({
+                "row": row, "text": texts[row], "morse": morse_texts[row], "samples": int(lengths[row]),
+                "duration_dot": float(duration_dots[row]), "frequency": float(frequencies[row]),
+                "amplitude": float(amplitudes[row]), "noise": float(noise_levels[row]),
+            }) + "\n")
+
+    os.replace(f"{labels_path}.tmp", labels_path)
+
+    return {
+        "name": name,
+        "rows": rows_count,
+        "samples": int(lengths.sum()),
+        "audio_seconds": float(lengths.sum()) / config.sampling_rate,
+        "cpu_seconds": time.process_time() - cpu_start,
+    }
+
+
+def _save_atomic(path, array):
+    # np.save appends .npy to names without it, so the temp name keeps the extension
+    temp_path = f"{path[:-4]}.tmp.npy"
+    np.save(temp_path, array)
+    os.replace(temp_path, path)
+
+
+def generate_dataset(out_dir, rows_count, rows_per_shard=512, workers=None, config=None):
+    # Shards are generated in a process pool, then index.json lists them with the config, so the dataset can be
+    # loaded back with np.load(..., mmap_mode='r'). Returns the index, with the throughput of the run
+    config = config or DatasetConfig()
+    os.makedirs(out_dir, exist_ok=True)
+
+    shard_rows = [min(rows_per_shard, rows_count - start) for start in range(0, rows_count, rows_per_shard)]
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        shards = list(pool.map(write_shard, [out_dir] * len(shard_rows), range(len(shard_rows)), shard_rows,
+                               [config] * len(shard_rows)))
+    elapsed = time.perf_counter() - start_time
+
+    audio_hours = sum(shard["audio_seconds"] for shard in shards) / 3600
+    cpu_minutes = sum(shard["cpu_seconds"] for shard in shards) / 60
+
+    index = {
+        "config": config._asdict(),
+        "rows": rows_count,
+        "shards": shards,
+        "audio_hours": audio_hours,
+        "seconds": elapsed,
+        "cpu_minutes": cpu_minutes,
+        "audio_hours_per_cpu_minute": audio_hours / cpu_minutes if cpu_minutes else 0.0,
+    }
+
+    index_path = os.path.join(out_dir, "index.json")
+    with open(f"{index_path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=2)
+
+    os.replace(f"{index_path}.tmp", index_path)
+    return index
+
+
+def main(argv=None):
+    defaults = DatasetConfig()
+    parser = argparse.ArgumentParser(description="Generate a sharded dataset of labeled synthetic morse clips")
+    parser.add_argument("out_dir", help="output folder of the shards and of index.json")
+    parser.add_argument("-n", "--rows", type=int, default=4096, help="clips to generate (default: %(default)s)")
+    parser.add_argument("--rows-per-shard", type=int, default=512, help="clips per shard (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--sampling-rate", type=int, default=defaults.sampling_rate)
+    parser.add_argument("--layout", choices=LAYOUTS, default=defaults.layout)
+    parser.add_argument("--dtype", choices=("float32", "float64"), default=defaults.dtype)
+    args = parser.parse_args(argv)
+
+    config = DatasetConfig(seed=args.seed, sampling_rate=args.sampling_rate, layout=args.layout, dtype=args.dtype)
+    index = generate_dataset(args.out_dir, args.rows, args.rows_per_shard, args.workers, config)
+
+    print(f"{index['rows']} clips in {len(index['shards'])} shards, {index['audio_hours']:.2f} audio-hours "
+          f"in {index['seconds']:.2f} s: {index['audio_hours_per_cpu_minute']:.2f} audio-hours per CPU-minute")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+####################################################################################################################
+# IMPORTS
+import cProfile
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+
+####################################################################################################################
+# CORE
+class _NullStage:
+    # Stage of NullMetrics: a shared context manager which records nothing
+
+    # ---> FUNCTIONS
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def add(self, **counts):
+        pass
+
+
+class NullMetrics:
+    # Default metrics of MorseConverter: every stage is the same no-op context manager, so an instrumented call
+    # costs a method call and nothing else
+
+    # ---> CONSTANTS
+    enabled = False
+
+    _NULL_STAGE = _NullStage()
+
+    # ---> FUNCTIONS
+    def stage(self, name, **counts):
+        return self._NULL_STAGE
+
+    def get_stats(self):
+        return {"stages": {}}
+
+    def reset(self):
+        pass
+
+
+class _Stage:
+    # A running stage of MorseMetrics: counts can be given upfront or added while the stage runs
+
+    # ---> CONSTRUCTOR
+    def __init__(self, metrics, name, counts):
+        self.metrics = metrics
+        self.name = name
+        self.counts = counts
+        self.start = None
+
+    # ---> FUNCTIONS
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.record(self.name, time.perf_counter() - self.start, self.counts, exc_type is not None)
+        return False
+
+    def add(self, **counts):
+        for count_name, value in counts.items():
+            self.counts[count_name] = self.counts.get(count_name, 0) + value
+
+
+class MorseMetrics:
+    # Per stage totals of a MorseConverter: calls, errors, seconds (total and max) and counts such as chars,
+    # samples and bytes. Stages can be nested (morse_process contains synthesis and export), so their seconds
+    # overlap. on_stage(name, seconds, counts) is called after every stage, to feed an external monitoring
+
+    # ---> CONSTANTS
+    enabled = True
+
+    # ---> CONSTRUCTOR
+    def __init__(self, on_stage=None):
+        self.on_stage = on_stage
+
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    # ---> FUNCTIONS
+    def stage(self, name, **counts):
+        return _Stage(self, name, counts)
+
+    def record(self, name, seconds, counts=None, failed=False):
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                              "counts": {}}
+
+            stats["calls"] += 1
+            stats["errors"] += failed
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            for count_name, value in (counts or {}).items():
+                stats["counts"][count_name] = stats["counts"].get(count_name, 0) + value
+
+        if self.on_stage is not None:
+            self.on_stage(name, seconds, counts or {})
+
+    def get_stats(self):
+        with self._lock:
+            return {"stages": {name: dict(stats, counts=dict(stats["counts"]))
+                               for name, stats in self._stages.items()}}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+@contextmanager
+def profiled(profile_path=None, snapshot_path=None):
+    # Profile the code of the with block: cProfile stats are dumped to profile_path (see pstats), the tracemalloc
+    # snapshot of its allocations still alive at the end, with the peak in "peak_bytes", to snapshot_path.
+    # Yields a dict filled on exit with the profiler and the snapshot, e.g.:
+    #   with profiled("export.prof") as profile:
+    #       converter.morse_process(morse_text, export_file=True)
+    result = {"profiler": None, "snapshot": None, "peak_bytes": None}
+
+    profiler = cProfile.Profile() if profile_path is not None else None
+    tracing = snapshot_path is not None and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield result
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            result["profiler"] = profiler
+
+        if snapshot_path is not None:
+            snapshot = tracemalloc.take_snapshot()
+            _, result["peak_bytes"] = tracemalloc.get_traced_memory()
+            if tracing:
+                tracemalloc.stop()
+
+            snapshot.dump(snapshot_path)
+            result["snapshot"] = snapshot
@@ -0,0 +1,338 @@
+####################################################################################################################
+# IMPORTS
+import argparse
+import asyncio
+import io
+import json
+import os
+import struct
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from MorseAudioCache import AudioCache
+from MorseConverter import MorseConverter, MorseTiming
+from MorseMetrics import MorseMetrics
+
+
+####################################################################################################################
+# CONSTANTS
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+WAV_CONTENT_TYPES = ("audio/wav", "audio/x-wav", "audio/wave")
+
+
+####################################################################################################################
+# ERRORS
+class HttpError(Exception):
+
+    # ---> CONSTRUCTOR
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+####################################################################################################################
+# CORE
+def make_wav_header(frames_count, sampling_rate):
+    # Header of a mono 16 bit PCM WAV file, so the samples can follow as they are streamed
+    data_size = frames_count * 2
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, 1, 1, sampling_rate,
+                       sampling_rate * 2, 2, 16, b'data', data_size)
+
+
+class MorseService:
+    # Local HTTP/1.1 service around a single shared converter, over TCP or a Unix socket:
+    #   POST /encode  text body -> morse text
+    #   POST /decode  morse text body -> text, or a WAV body (Content-Type audio/wav) -> text
+    #   POST /render  text body (morse text with ?morse=1) -> WAV, streamed with chunked transfer encoding
+    #   GET  /stats   JSON of the service counters and of the converter metrics and caches
+    # Conversions run in a bounded thread pool, so the event loop only moves bytes.
+    # The WAV header of a render is sent before any synthesis. Signals up to COALESCE_MAX_SECONDS are rendered
+    # whole, through the audio cache, and identical renders in flight are coalesced: later requests wait for the
+    # render already running instead of starting their own. Longer signals are streamed a few chunks at a time
+    # as the client drains them (served by the audio cache on a hit), so their memory stays bounded whatever
+    # their length
+
+    # ---> CONSTANTS
+    MAX_BODY_BYTES = 1024 * 1024
+    MAX_AUDIO_SECONDS = 2 * 60 * 60  # Longer renders are refused, a megabyte of text would be days of audio
+    COALESCE_MAX_SECONDS = 60  # Longest signal rendered whole (about 5 MB of int16), shared and cached
+    INLINE_CHARS = 4096  # Shorter texts are encoded on the event loop, it's faster than a trip to the pool
+    STREAM_CHUNK_SAMPLES = 32768
+    STREAM_BATCH_CHUNKS = 4  # Chunks synthesized by every trip to the pool, for the streamed renders
+
+    # ---> CONSTRUCTOR
+    def __init__(self, converter=None, workers=None):
+        self.converter = converter or MorseConverter(metrics=MorseMetrics())
+        self.executor = ThreadPoolExecutor(workers or min(4, os.cpu_count() or 1), thread_name_prefix="morse")
+
+        self.requests = 0
+        self.errors = 0
+        self.render_calls = 0  # Renders handed to the converter, which may still serve them from its audio cache
+        self.coalesced = 0
+        self.streams = 0
+
+        self._inflight = {}
+
+    # ---> FUNCTIONS
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, unix_path)
+
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        # Requests of a connection are served one after the other, until the client closes it
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+
+                method, path, query, headers, body, keep_alive = request
+                self.requests += 1
+                try:
+                    await self._dispatch(writer, method, path, query, headers, body, keep_alive)
+                except HttpError as error:
+                    self.errors += 1
+                    await self._send(writer, error.status, f"{error}\n".encode(), "text/plain", keep_alive)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as error:
+                    self.errors += 1
+                    await self._send(writer, 500, f"{type(error).__name__}: {error}\n".encode(), "text/plain",
+                                     keep_alive)
+
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        # Returns (method, path, query, headers, body, keep alive), None when the client closed the connection
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            await self._send(writer, 400, b"Malformed request line\n", "text/plain", False)
+            return None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            content_length = int(headers.get("content-length") or 0)
+        except ValueError:
+            await self._send(writer, 400, b"Invalid Content-Length\n", "text/plain", False)
+            return None
+
+        if content_length > self.MAX_BODY_BYTES:
+            await self._send(writer, 413, b"Body too large\n", "text/plain", False)
+            return None
+
+        body = await reader.readexactly(content_length) if content_length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+        url = urlsplit(target)
+        return method.upper(), url.path, parse_qs(url.query), headers, body, keep_alive
+
+    async def _dispatch(self, writer, method, path, query, headers, body, keep_alive):
+        if path == "/stats":
+            self._check_method(method, "GET")
+            await self._send(writer, 200, json.dumps(self.get_stats()).encode(), "application/json", keep_alive)
+
+        elif path == "/encode":
+            self._check_method(method, "POST")
+            morse_text = await self.encode(self._get_text(body))
+            await self._send(writer, 200, morse_text.encode(), "text/plain; charset=utf-8", keep_alive)
+
+        elif path == "/decode":
+            self._check_method(method, "POST")
+            if headers.get("content-type", "").split(";")[0].strip() in WAV_CONTENT_TYPES:
+                text = await self._run(self.converter.wav_to_string, io.BytesIO(body))
+            else:
+                text = await self._run(self.converter.morse_to_string, self._get_text(body))
+
+            await self._send(writer, 200, text.encode(), "text/plain; charset=utf-8", keep_alive)
+
+        elif path == "/render":
+            self._check_method(method, "POST")
+            text = self._get_text(body)
+            morse_text = text if query.get("morse", ["0"])[0] == "1" else await self.encode(text)
+            await self._stream_render(writer, morse_text, keep_alive)
+
+        else:
+            raise HttpError(404, f"Unknown path: {path}")
+
+    @staticmethod
+    def _check_method(method, expected):
+        if method != expected:
+            raise HttpError(405, f"Expected {expected}")
+
+    @staticmethod
+    def _get_text(body):
+        try:
+            return body.decode("utf-8")
+        except UnicodeDecodeError as error:
+            raise HttpError(400, f"Body is not UTF-8: {error}") from error
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def encode(self, text):
+        if len(text) <= self.INLINE_CHARS:
+            return self.converter.string_to_morse(text)
+
+        return await self._run(self.converter.string_to_morse, text)
+
+    async def render(self, morse_text):
+        # int16 samples of the morse text: a render of the same text already in flight is shared
+        future = self._inflight.get(morse_text)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.render_calls += 1
+            future = asyncio.ensure_future(self._run(self.converter.render_audio, morse_text))
+            self._inflight[morse_text] = future
+            future.add_done_callback(lambda _: self._inflight.pop(morse_text, None))
+
+        # A client going away must not cancel the render for the others waiting on it
+        return await asyncio.shield(future)
+
+    async def _stream_render(self, writer, morse_text, keep_alive):
+        # Chunked transfer encoding: the header, then the samples a chunk at a time, waiting for the client
+        # to drain each one, so a slow client never buffers the whole file in the service
+        sampling_rate = self.converter.SAMPLING_RATE
+        samples_count = self.converter.get_samples_count(morse_text)
+        if samples_count > self.MAX_AUDIO_SECONDS * sampling_rate:
+            raise HttpError(413, f"Audio longer than {self.MAX_AUDIO_SECONDS} seconds")
+
+        writer.write(self._get_head(200, "audio/wav", keep_alive, {"Transfer-Encoding": "chunked"}))
+        self._write_chunk(writer, make_wav_header(samples_count, sampling_rate))
+        await writer.drain()
+
+        try:
+            if samples_count <= self.COALESCE_MAX_SECONDS * sampling_rate:
+                all_notes = await self.render(morse_text)
+                for start in range(0, len(all_notes), self.STREAM_CHUNK_SAMPLES):
+                    chunk = all_notes[start:start + self.STREAM_CHUNK_SAMPLES]
+                    self._write_chunk(writer, chunk.astype('<i2', copy=False).tobytes())
+                    await writer.drain()
+            else:
+                self.streams += 1
+                chunks = self.converter.iter_audio_chunks(morse_text, self.STREAM_CHUNK_SAMPLES)
+                while True:
+                    data = await self._run(self._pull_chunks, chunks)
+                    if not data:
+                        break
+
+                    self._write_chunk(writer, data)
+                    await writer.drain()
+
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as error:
+            # The status line is already sent: the error can only cut the response short
+            self.errors += 1
+            raise ConnectionAbortedError(f"Render failed: {error}") from error
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _pull_chunks(self, chunks):
+        # Pool side of a streamed render: the next STREAM_BATCH_CHUNKS chunks as WAV bytes, b"" at the end
+        data = []
+        for chunk in chunks:
+            data.append(chunk.astype('<i2', copy=False).tobytes())
+            if len(data) == self.STREAM_BATCH_CHUNKS:
+                break
+
+        return b"".join(data)
+
+    @staticmethod
+    def _write_chunk(writer, data):
+        writer.write(b"%X\r\n" % len(data) + data + b"\r\n")
+
+    @staticmethod
+    def _get_head(status, content_type, keep_alive, extra_headers):
+        lines = [f"HTTP/1.1 {status} {HTTP_REASONS[status]}", f"Content-Type: {content_type}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in extra_headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer, status, body, content_type, keep_alive):
+        writer.write(self._get_head(status, content_type, keep_alive, {"Content-Length": len(body)}) + body)
+        await writer.drain()
+
+    def get_stats(self):
+        stats = self.converter.get_stats()
+        stats["service"] = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "render_calls": self.render_calls,
+            "coalesced": self.coalesced,
+            "streams": self.streams,
+            "inflight": len(self._inflight),
+        }
+        return stats
+
+
+async def serve(service, host="127.0.0.1", port=8765, unix_path=None):
+    server = await service.start(host, port, unix_path)
+    address = unix_path or ", ".join(f"{socket.getsockname()[0]}:{socket.getsockname()[1]}"
+                                     for socket in server.sockets)
+    print(f"Morse service listening on {address}", flush=True)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service for morse encoding, decoding and rendering")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port (default: %(default)s)")
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="conversion threads (default: up to 4)")
+    parser.add_argument("--cache-mb", type=int, default=64,
+                        help="memory for the rendered audio cache, 0 disables it (default: %(default)s)")
+    parser.add_argument("--dot", type=float, default=MorseTiming().duration_dot,
+                        help="dot duration in seconds (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    audio_cache = AudioCache(memory_budget=args.cache_mb * 1024 * 1024) if args.cache_mb > 0 else None
+    converter = MorseConverter(timing=MorseTiming(args.dot), audio_cache=audio_cache, metrics=MorseMetrics())
+    service = MorseService(converter, args.workers)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
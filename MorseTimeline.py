@@ -0,0 +1,136 @@
+####################################################################################################################
+# IMPORTS
+import numpy as np
+
+
+####################################################################################################################
+# CONSTANTS
+# Units of the element keyed by each morse char (0: the char only adds the gap after it), and its key state
+_ELEMENT_UNITS = {'.': 1, '-': 3, '_': 3, ' ': 3, '|': 7}
+_ELEMENT_KEY_DOWN = {'.', '-', '_'}
+
+GAP_UNITS = 1  # Gap after every char
+EDGE_UNITS = 3  # Silence at the start and at the end of the signal
+
+
+####################################################################################################################
+# CORE
+class MorseTimeline:
+    # Timing of a morse signal as run length events: key_down[i] is held for units[i] dot units.
+    # It's the layer between the morse text and anything rendered from it (samples, plots, keyer or LED output),
+    # so consumers which only need timing never allocate sample buffers.
+    # Events follow the keying of MorseConverter one by one (a char element, then its gap), without merging
+    # adjacent silences, so samples rendered event by event match the converter's signal exactly
+
+    # ---> CONSTRUCTOR
+    def __init__(self, key_down, units):
+        self.key_down = np.asarray(key_down, dtype=bool)
+        self.units = np.asarray(units, dtype=np.int64)
+
+        if self.key_down.shape != self.units.shape or self.key_down.ndim != 1:
+            raise ValueError("key_down and units must be 1D arrays of the same length")
+
+    # ---> FUNCTIONS
+    @classmethod
+    def from_morse(cls, morse_text, edges=True):
+        # Vectorized walk of the morse text: every char gives its element (if any) followed by a 1 unit gap.
+        # With edges, the signal starts and ends with EDGE_UNITS of silence
+        codes = np.frombuffer(morse_text.encode('utf-32-le'), dtype=np.uint32)
+
+        element_units = np.zeros(len(codes), dtype=np.int64)
+        element_key_down = np.zeros(len(codes), dtype=bool)
+        for char, units in _ELEMENT_UNITS.items():
+            is_char = codes == ord(char)
+            element_units[is_char] = units
+            element_key_down[is_char] = char in _ELEMENT_KEY_DOWN
+
+        units = np.stack((element_units, np.full(len(codes), GAP_UNITS))).T.ravel()
+        key_down = np.stack((element_key_down, np.zeros(len(codes), dtype=bool))).T.ravel()
+
+        # Chars without an element only add their gap
+        has_units = units > 0
+        units, key_down = units[has_units], key_down[has_units]
+
+        if edges:
+            units = np.concatenate(([EDGE_UNITS], units, [EDGE_UNITS]))
+            key_down = np.concatenate(([False], key_down, [False]))
+
+        return cls(key_down, units)
+
+    @classmethod
+    def concatenate(cls, timelines):
+        timelines = list(timelines)
+        if not timelines:
+            return cls(np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64))
+
+        return cls(np.concatenate([timeline.key_down for timeline in timelines]),
+                   np.concatenate([timeline.units for timeline in timelines]))
+
+    def __add__(self, other):
+        return MorseTimeline.concatenate((self, other))
+
+    def __len__(self):
+        return len(self.units)
+
+    def __getitem__(self, item):
+        # Slicing by event index
+        if not isinstance(item, slice):
+            return bool(self.key_down[item]), int(self.units[item])
+
+        return MorseTimeline(self.key_down[item], self.units[item])
+
+    def __iter__(self):
+        return zip(self.key_down.tolist(), self.units.tolist())
+
+    def __eq__(self, other):
+        return (isinstance(other, MorseTimeline) and np.array_equal(self.key_down, other.key_down)
+                and np.array_equal(self.units, other.units))
+
+    def __repr__(self):
+        return f"MorseTimeline({len(self)} events, {self.get_total_units()} units)"
+
+    def get_total_units(self):
+        return int(self.units.sum())
+
+    def get_key_down_units(self):
+        return int(self.units[self.key_down].sum())
+
+    def get_start_units(self):
+        # Start of every event, in dot units from the start of the timeline
+        return np.cumsum(self.units) - self.units
+
+    def get_duration(self, duration_dot):
+        return self.get_total_units() * duration_dot
+
+    def get_times(self, duration_dot):
+        # (start, duration) in seconds of every event, e.g. to schedule a keyer
+        return self.get_start_units() * duration_dot, self.units * duration_dot
+
+    def slice_units(self, start_unit, stop_unit):
+        # Events between two instants, in dot units: events across the bounds are cut
+        starts = self.get_start_units()
+        ends = starts + self.units
+
+        selected = (ends > start_unit) & (starts < stop_unit)
+        units = np.minimum(ends[selected], stop_unit) - np.maximum(starts[selected], start_unit)
+
+        return MorseTimeline(self.key_down[selected], units)
+
+    def slice_time(self, start, stop, duration_dot):
+        return self.slice_units(int(round(start / duration_dot)), int(round(stop / duration_dot)))
+
+    def merged(self):
+        # Compact form with adjacent events of the same state joined, e.g. for keyer output.
+        # Sample counts of merged silences may differ by truncation, so render samples from the original events
+        if len(self) == 0:
+            return MorseTimeline(self.key_down, self.units)
+
+        starts = np.concatenate(([0], np.flatnonzero(self.key_down[1:] != self.key_down[:-1]) + 1))
+        return MorseTimeline(self.key_down[starts], np.add.reduceat(self.units, starts))
+
+    def get_samples_counts(self, sampling_rate, duration_dot):
+        # Samples of every event, truncated like MorseConverter does for each segment
+        return (sampling_rate * (duration_dot * self.units)).astype(np.int64)
+
+    def get_samples_count(self, sampling_rate, duration_dot):
+        return int(self.get_samples_counts(sampling_rate, duration_dot).sum())
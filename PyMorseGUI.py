@@ -1,5 +1,8 @@
 ####################################################################################################################
 # IMPORTS
+import os
+import queue
+import threading
 import tkinter as tk
 
 from tkinter import ttk, messagebox
@@ -18,6 +21,7 @@ class MorseGUI:
     OUTPUT_TEXT_PH = f"Morse Code:\n"
     DARK_THEME = "dark"
     DEFAULT_THEME = "default"
+    JOB_POLL_MS = 100  # Interval of the checks on the background job
 
     # ---> ATTRIBUTES
     screen_width = int(GetSystemMetrics(0) / 2)
@@ -30,6 +34,12 @@ class MorseGUI:
         self._frame_border_enabled = frame_border
         self._current_theme = self.DEFAULT_THEME
 
+        # ---> BACKGROUND JOB
+        # Synthesis, playback and export run on a worker thread, which reports back through a queue
+        self._job_thread = None
+        self._job_stop_event = threading.Event()
+        self._job_queue = queue.Queue()
+
         # ---> MAIN LAYOUT
         # Root Frame, Toolbar, Explorer Panel, Main Panel, Help Panel
         self._init_root()
@@ -128,7 +138,7 @@ class MorseGUI:
     def _play_morse(self):
         output_text = self._root.nametowidget("frame_root.frame_main.txt_output").get("1.0", "end-1c")
         output_text = output_text.replace(self.OUTPUT_TEXT_PH, " ")
-        self._morse_converter.morse_process(output_text, True, False, False)
+        self._start_job(self._play_job, output_text)
 
     def _process_morse(self):
         output_text = self._root.nametowidget("frame_root.frame_main.txt_output").get("1.0", "end-1c")
@@ -173,7 +183,8 @@ class MorseGUI:
                 export_file = True
 
             if play_sound or print_plot or export_file:
-                self._morse_converter.morse_process(output_text, play_sound, print_plot, export_file)
+                if self._start_job(self._process_job, output_text, play_sound, print_plot, export_file):
+                    popup.destroy()
             else:
                 messagebox.showerror("Error", "Choice one at least")
 
@@ -183,6 +194,89 @@ class MorseGUI:
         zag_tk = ZAGThemeTk()
         zag_tk.apply_theme_recurs(popup, self._current_theme)
 
+    def _stop_job(self):
+        self._job_stop_event.set()
+
+    def _start_job(self, job, *args):
+        # A single job at a time, so repeated clicks can't queue overlapping playbacks or exports
+        if self._job_thread is not None and self._job_thread.is_alive():
+            messagebox.showwarning("Busy", "Another operation is running, wait for it or stop it")
+            return False
+
+        self._job_stop_event.clear()
+        self._set_status("Working...")
+
+        self._job_thread = threading.Thread(target=self._run_job, args=(job, *args), daemon=True)
+        self._job_thread.start()
+        self._root.after(self.JOB_POLL_MS, self._poll_job)
+
+        return True
+
+    def _run_job(self, job, *args):
+        # Worker thread: never touch the widgets from here, only the queue
+        try:
+            job(*args)
+        except Exception as error:
+            self._job_queue.put(("error", str(error)))
+
+        self._job_queue.put(("done", None))
+
+    def _poll_job(self):
+        # Tk thread: apply what the worker reported, then check again until the job is done
+        done = False
+        while not self._job_queue.empty():
+            action, value = self._job_queue.get_nowait()
+            match action:
+                case "status":
+                    self._set_status(value)
+
+                case "plot":
+                    all_notes, morse_text = value
+                    self._morse_converter.print_plot(all_notes, block=False, timeline=morse_text)
+
+                case "error":
+                    messagebox.showerror("Error", value)
+
+                case "done":
+                    done = True
+
+        if done:
+            self._set_status("Stopped" if self._job_stop_event.is_set() else "Done")
+        else:
+            self._root.after(self.JOB_POLL_MS, self._poll_job)
+
+    def _report_progress(self, description, samples_done, samples_count):
+        self._job_queue.put(("status", f"{description}... {samples_done * 100 // max(samples_count, 1)}%"))
+
+    def _play_job(self, morse_text):
+        self._morse_converter.play_stream(
+            morse_text, stop_event=self._job_stop_event,
+            on_progress=lambda samples_done, samples_count: self._report_progress("Playing", samples_done,
+                                                                                  samples_count))
+
+    def _process_job(self, morse_text, play_sound, print_plot, export_file):
+        if print_plot:
+            # The plot window belongs to the Tk thread, here the signal is only synthesized
+            self._job_queue.put(("status", "Synthesizing..."))
+            all_notes = self._morse_converter.morse_process(morse_text, dtype="int16")
+            self._job_queue.put(("plot", (all_notes, morse_text)))
+
+        if play_sound and not self._job_stop_event.is_set():
+            self._play_job(morse_text)
+
+        if export_file and not self._job_stop_event.is_set():
+            out_path = self._morse_converter.export_wav(
+                morse_text, stop_event=self._job_stop_event,
+                on_progress=lambda samples_done, samples_count: self._report_progress("Exporting", samples_done,
+                                                                                      samples_count))
+
+            # Don't leave a truncated file behind
+            if self._job_stop_event.is_set() and os.path.isfile(out_path):
+                os.remove(out_path)
+
+    def _set_status(self, status):
+        self._root.nametowidget("frame_root.frame_main.frame_command.lbl_status").configure(text=status)
+
     def _clean_input(self):
         input_text = self._root.nametowidget("frame_root.frame_main.txt_input")
         input_text.configure(state="normal")
@@ -327,6 +421,14 @@ class MorseGUI:
                                command=self._clean_input, image=self._icon_recycle_bin)
         clean_btn.grid(row=2, column=3, padx=5, pady=5)
 
+        # ---> Button Stop
+        stop_btn = ttk.Button(command_frame, name="btn_stop", text="Stop", command=self._stop_job)
+        stop_btn.grid(row=2, column=4, padx=5, pady=5)
+
+        # ---> Status of the background job
+        status_label = ttk.Label(command_frame, name="lbl_status", text="", anchor=tk.CENTER)
+        status_label.grid(row=3, column=0, columnspan=5, padx=5, pady=5, sticky="ew")
+
         # ---> Default input ph conversion
         self._convert_text()
 
@@ -0,0 +1,56 @@
+####################################################################################################################
+# IMPORTS
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+####################################################################################################################
+# CONSTANTS
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What importing MorseConverter used to pull in, before plotting and playback became lazy backends
+EAGER_MODULES = ["numpy", "matplotlib.pyplot", "sounddevice", "scipy.io.wavfile"]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+for module_name in sys.argv[1:]:
+    try:
+        __import__(module_name)
+    except (ImportError, OSError):
+        pass
+print(time.perf_counter() - start)
+"""
+
+
+####################################################################################################################
+# CORE
+def time_import(module_names, runs):
+    # Every run is a fresh interpreter, so nothing is already in sys.modules
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT, *module_names], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(float(output))
+
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of the MorseConverter core vs its former eager imports")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per measure")
+    args = parser.parse_args()
+
+    core_time = time_import(["MorseConverter"], args.runs)
+    eager_time = time_import(EAGER_MODULES + ["MorseConverter"], args.runs)
+
+    print(f"import MorseConverter (lazy backends): {core_time * 1000:8.1f} ms")
+    print(f"import MorseConverter + eager backends: {eager_time * 1000:8.1f} ms")
+    print(f"gain: {(eager_time - core_time) * 1000:.1f} ms ({eager_time / core_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
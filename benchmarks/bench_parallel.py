@@ -0,0 +1,60 @@
+####################################################################################################################
+# IMPORTS
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MorseConverter import MorseConverter
+
+
+####################################################################################################################
+# CONSTANTS
+SAMPLE_TEXT = "THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG 0123456789 "
+
+
+####################################################################################################################
+# CORE
+def time_render(converter, morse_text, workers, executor, runs):
+    # Best of runs, after a warm up run which also fills the waveform templates
+    morse_audio = converter.morse_process(morse_text, workers=workers, executor=executor)
+
+    best_time = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        converter.morse_process(morse_text, workers=workers, executor=executor)
+        best_time = min(best_time, time.perf_counter() - start)
+
+    return best_time, morse_audio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling of morse_process across workers")
+    parser.add_argument("--repeat", type=int, default=10, help="repetitions of the sample text")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per configuration, the best one is kept")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--executors", nargs="+", default=["thread", "process"])
+    args = parser.parse_args()
+
+    converter = MorseConverter()
+    morse_text = converter.string_to_morse(SAMPLE_TEXT * args.repeat)
+    audio_seconds = converter.get_samples_count(morse_text) / converter.SAMPLING_RATE
+
+    serial_time, serial_audio = time_render(converter, morse_text, None, None, args.runs)
+    print(f"{len(morse_text)} morse chars, {audio_seconds / 60:.1f} minutes of audio, {os.cpu_count()} CPUs")
+    print(f"{'serial':>8} {'':>3} {serial_time:8.3f} s")
+
+    for executor in args.executors:
+        for workers in args.workers:
+            elapsed, morse_audio = time_render(converter, morse_text, workers, executor, args.runs)
+            identical = np.array_equal(morse_audio, serial_audio)
+            print(f"{executor:>8} {workers:>3} {elapsed:8.3f} s  x{serial_time / elapsed:5.2f}"
+                  f"  {'identical' if identical else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+####################################################################################################################
+# IMPORTS
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+
+####################################################################################################################
+# CONSTANTS
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED = 20240501
+WORDS = ("CQ", "DE", "PARIS", "QTH", "RST", "599", "73", "TEST", "SOS", "HELLO", "WORLD", "MORSE")
+
+
+####################################################################################################################
+# CORE
+def make_messages(count, words_per_message):
+    rng = random.Random(SEED)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_message)) for _ in range(count)]
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_service(port, workers, cache_mb):
+    # A local instance in its own process, so the clients don't compete with it for the GIL
+    command = [sys.executable, os.path.join(ROOT_DIR, "MorseService.py"), "--port", str(port),
+               "--cache-mb", str(cache_mb)]
+    if workers:
+        command += ["--workers", str(workers)]
+
+    process = subprocess.Popen(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.05)
+
+    process.kill()
+    raise RuntimeError("The service didn't start")
+
+
+def run_client(host, port, path, messages, requests_count, latencies, audio_bytes, errors, rng_seed):
+    # One persistent connection, sending requests back to back
+    rng = random.Random(rng_seed)
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        for _ in range(requests_count):
+            body = rng.choice(messages).encode()
+            start = time.perf_counter()
+            connection.request("POST", path, body=body, headers={"Content-Type": "text/plain"})
+            response = connection.getresponse()
+            data = response.read()
+            latencies.append(time.perf_counter() - start)
+
+            if response.status != 200:
+                errors.append(response.status)
+            elif path == "/render":
+                audio_bytes.append(len(data) - 44)
+    finally:
+        connection.close()
+
+
+def get_percentile(sorted_values, percentile):
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of MorseService: p50/p99 latency and throughput")
+    parser.add_argument("--url", default=None, help="service to test, by default a local instance is started")
+    parser.add_argument("--endpoint", choices=("encode", "render"), default="render")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--distinct", type=int, default=16,
+                        help="distinct messages: fewer means more coalesced and cached renders")
+    parser.add_argument("--words", type=int, default=5, help="words per message")
+    parser.add_argument("--workers", type=int, default=None, help="conversion threads of the local instance")
+    parser.add_argument("--cache-mb", type=int, default=64, help="audio cache of the local instance, 0 disables it")
+    args = parser.parse_args()
+
+    process = None
+    if args.url is None:
+        host, port = "127.0.0.1", get_free_port()
+        process = start_service(port, args.workers, args.cache_mb)
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+
+    try:
+        messages = make_messages(args.distinct, args.words)
+        latencies, audio_bytes, errors = [], [], []
+        clients = [threading.Thread(target=run_client,
+                                    args=(host, port, f"/{args.endpoint}", messages, args.requests, latencies,
+                                          audio_bytes, errors, SEED + index))
+                   for index in range(args.clients)]
+
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+
+        connection = http.client.HTTPConnection(host, port, timeout=10)
+        connection.request("GET", "/stats")
+        stats = json.loads(connection.getresponse().read())
+        connection.close()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    print(f"{len(latencies)} {args.endpoint} requests from {args.clients} clients in {elapsed:.2f} s, "
+          f"{len(errors)} errors")
+    print(f"latency p50 {get_percentile(latencies, 50) * 1000:.2f} ms, p99 {get_percentile(latencies, 99) * 1000:.2f}"
+          f" ms, mean {statistics.mean(latencies) * 1000:.2f} ms")
+    print(f"throughput {len(latencies) / elapsed:.1f} requests/s", end="")
+    if audio_bytes:
+        print(f", {sum(audio_bytes) / 2 / 44100 / elapsed:.1f} audio-seconds/s", end="")
+    print()
+
+    # Every render call which missed the audio cache was synthesized
+    service = stats["service"]
+    print(f"service: {service['render_calls']} render calls, {service['coalesced']} coalesced", end="")
+    audio_cache = stats["caches"].get("audio_cache")
+    if audio_cache is not None:
+        print(f", audio cache {audio_cache['memory_hits'] + audio_cache['disk_hits']} hits, "
+              f"{audio_cache['misses']} synthesized", end="")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+####################################################################################################################
+# IMPORTS
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MorseConverter import MorseConverter
+
+
+####################################################################################################################
+# CONSTANTS
+SEED = 20240501
+WORDS = ("THE", "QUICK", "BROWN", "FOX", "JUMPS", "OVER", "LAZY", "DOG", "PARIS", "CQ", "DE", "QTH", "RST", "73",
+         "HELLO", "WORLD", "MORSE", "CODE", "SIGNAL", "STATION", "1234", "5678", "90", "OK?", "YES.", "NO,")
+
+# Corpus name -> size in chars. Every corpus is generated from SEED, so runs on any machine use the same texts
+CORPORA = {
+    "callsign": 6,
+    "sentence": 64,
+    "paragraph": 1024,
+    "page": 16 * 1024,
+    "book": 1024 * 1024,
+}
+
+# Audio grows by about 10^5 samples per char: larger corpora would need gigabytes of samples
+AUDIO_MAX_CHARS = 1024
+
+# Minimum length of a timed sample: short calls are repeated in a loop, like timeit does, so microsecond calls
+# aren't lost in the timer resolution and in the scheduling noise
+MIN_SAMPLE_SECONDS = 0.2
+
+# Same prefix of MorseGUI.OUTPUT_TEXT_PH, so the GUI conversion is measured without a Tk display
+OUTPUT_TEXT_PH = "Morse Code:\n"
+
+
+####################################################################################################################
+# CORE
+def make_corpus(name):
+    # Random words and blanks up to the size of the corpus, the call sign is a fixed one
+    size = CORPORA[name]
+    if size <= 6:
+        return "IZ0ABC"[:size]
+
+    rng = random.Random(f"{SEED}:{name}")
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+
+    return " ".join(words)[:size]
+
+
+def get_benchmarks(converter, temp_dir):
+    # Benchmark name -> (needs audio, setup(text) returning the measured call and the samples it produces)
+    def encode(text):
+        return lambda: converter.string_to_morse(text), None
+
+    def gui_convert(text):
+        # Stand-in of MorseGUI._convert_text: Tk returns the input with a trailing newline
+        input_text = text + "\n"
+        return lambda: OUTPUT_TEXT_PH + converter.string_to_morse(input_text), None
+
+    def synthesis(text):
+        morse_text = converter.string_to_morse(text)
+        return lambda: converter.morse_process(morse_text), converter.get_samples_count(morse_text)
+
+    def int16(text):
+        morse_text = converter.string_to_morse(text)
+        return lambda: converter.synthesize(morse_text, np.int16), converter.get_samples_count(morse_text)
+
+    def export_file(text):
+        all_notes = converter.synthesize(converter.string_to_morse(text), np.int16)
+        target = os.path.join(temp_dir, "export_file.wav")
+        return lambda: converter.export_file(all_notes, target), len(all_notes)
+
+    def export_wav(text):
+        morse_text = converter.string_to_morse(text)
+        target = os.path.join(temp_dir, "export_wav.wav")
+        return lambda: converter.export_wav(morse_text, target), converter.get_samples_count(morse_text)
+
+    return {
+        "encode": (False, encode),
+        "gui_convert": (False, gui_convert),
+        "synthesis": (True, synthesis),
+        "int16": (True, int16),
+        "export_file": (True, export_file),
+        "export_wav": (True, export_wav),
+    }
+
+
+def get_loops(timer):
+    # Calls per sample, 1, 2, 5, 10, 20, 50... up to MIN_SAMPLE_SECONDS, like timeit.Timer.autorange
+    loops = 1
+    while True:
+        for factor in (1, 2, 5):
+            if timer.timeit(loops * factor) >= MIN_SAMPLE_SECONDS:
+                return loops * factor
+
+        loops *= 10
+
+
+def prepare(call):
+    # Warm up once (templates, alphabet), then size the timed loop; the peak memory comes from one more traced
+    # call, since tracing slows down every allocation. Returns (timer, loops, peak_bytes)
+    call()
+
+    timer = timeit.Timer(call)
+    loops = get_loops(timer)
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return timer, loops, peak_bytes
+
+
+def run_suite(benchmark_names=None, corpus_names=None, runs=5, audio_max_chars=AUDIO_MAX_CHARS, log=None):
+    converter = MorseConverter()
+    cases = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        benchmarks = get_benchmarks(converter, temp_dir)
+        for corpus_name in corpus_names or CORPORA:
+            text = make_corpus(corpus_name)
+
+            for benchmark_name in benchmark_names or benchmarks:
+                needs_audio, setup = benchmarks[benchmark_name]
+                if needs_audio and len(text) > audio_max_chars:
+                    continue
+
+                call, samples_count = setup(text)
+                cases.append((f"{benchmark_name}/{corpus_name}", len(text), samples_count, *prepare(call)))
+
+        # Every round times each benchmark once, so the runs of a benchmark are spread over the whole suite and
+        # a busy moment of the machine slows down a single run of several benchmarks, not every run of one
+        timings = {key: [] for key, *_ in cases}
+        for _ in range(runs):
+            for key, _, _, timer, loops, _ in cases:
+                timings[key].append(timer.timeit(loops) / loops)
+
+    results = {}
+    for key, chars, samples_count, _, loops, peak_bytes in cases:
+        seconds = statistics.median(timings[key])
+        result = {
+            "chars": chars,
+            "seconds": seconds,
+            "best_seconds": min(timings[key]),
+            "worst_seconds": max(timings[key]),
+            "loops": loops,
+            "peak_bytes": peak_bytes,
+            "chars_per_second": chars / seconds if seconds else None,
+        }
+        if samples_count is not None:
+            result["samples"] = samples_count
+            result["samples_per_second"] = samples_count / seconds if seconds else None
+
+        results[key] = result
+        if log is not None:
+            print(format_result(key, result), file=log, flush=True)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": SEED,
+            "runs": runs,
+        },
+        "results": results,
+    }
+
+
+def format_result(key, result):
+    line = (f"{key:<24} {result['seconds'] * 1000:10.3f} ms  {result['peak_bytes'] / 2 ** 20:9.2f} MiB  "
+            f"{result['chars_per_second'] or 0:14.0f} chars/s")
+    if "samples_per_second" in result:
+        line += f"  {result['samples_per_second'] or 0:14.0f} samples/s"
+
+    return line
+
+
+def compare(baseline, current, threshold):
+    # Benchmarks slower, or with a higher peak memory, than the baseline by more than threshold (a fraction).
+    # Times are noise aware: even the best current run has to be slower than the slowest baseline run, so a
+    # slowdown within the spread of the baseline runs is never flagged. Peak memory doesn't depend on the load.
+    # Returns the (key, metric, baseline value, current value) of every regression
+    regressions = []
+    for key, result in current["results"].items():
+        base_result = baseline["results"].get(key)
+        if base_result is None or base_result["chars"] != result["chars"]:
+            continue
+
+        base_seconds = base_result.get("worst_seconds", base_result["best_seconds"])
+        for metric, base_value, value in (("seconds", base_seconds, result["best_seconds"]),
+                                          ("peak_bytes", base_result["peak_bytes"], result["peak_bytes"])):
+            if base_value and value > base_value * (1 + threshold):
+                regressions.append((key, metric, base_value, value))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wall time, peak memory and throughput of encoding, synthesis, "
+                                                 "export and GUI conversion on fixed corpora")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown or memory growth flagged as a regression (default: %(default)s)")
+    parser.add_argument("--runs", type=int, default=5,
+                        help=f"timed runs per benchmark, each of at least {MIN_SAMPLE_SECONDS} s (default: %(default)s)")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(get_benchmarks(None, None)), default=None)
+    parser.add_argument("--corpora", nargs="+", choices=list(CORPORA), default=None)
+    parser.add_argument("--audio-max-chars", type=int, default=AUDIO_MAX_CHARS,
+                        help="largest corpus rendered to audio (default: %(default)s)")
+    args = parser.parse_args()
+
+    current = run_suite(args.benchmarks, args.corpora, args.runs, args.audio_max_chars, log=sys.stdout)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+        regressions = compare(baseline, current, args.threshold)
+        for key, metric, base_value, value in regressions:
+            print(f"REGRESSION {key} {metric}: {base_value:.6g} -> {value:.6g} (x{value / base_value:.2f})")
+
+        if regressions:
+            return 1
+
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+####################################################################################################################
+# IMPORTS
+import os
+import sys
+
+# The modules live at the top of the repository, like for the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
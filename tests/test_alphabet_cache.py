@@ -0,0 +1,104 @@
+####################################################################################################################
+# IMPORTS
+import json
+import os
+import pickle
+import shutil
+
+from MorseAlphabet import ALPHABET_PATH, AlphabetRegistry, MorseAlphabet, get_alphabet
+from MorseConverter import MorseConverter
+
+
+####################################################################################################################
+# CORE
+class _Planted:
+    # Runs a side effect when unpickled, as a malicious cache file would
+    def __init__(self, marker_path):
+        self.marker_path = marker_path
+
+    def __reduce__(self):
+        return open, (self.marker_path, "w")
+
+
+def get_cache_files(cache_dir):
+    return sorted(os.listdir(cache_dir))
+
+
+def test_cache_round_trip(tmp_path):
+    AlphabetRegistry(cache_dir=str(tmp_path)).get()
+    cache_files = get_cache_files(tmp_path)
+    assert len(cache_files) == 1 and cache_files[0].endswith(".json")
+
+    registry = AlphabetRegistry(cache_dir=str(tmp_path))
+    alphabet = registry.get()
+    assert (registry.loads, registry.cache_loads) == (0, 1)
+
+    reference = get_alphabet()
+    assert alphabet.str_to_morse == reference.str_to_morse
+    assert alphabet.decode_table == reference.decode_table
+    assert alphabet.get_compiled() == reference.get_compiled()
+    assert alphabet.encode_char('S') == reference.encode_char('S')
+    assert alphabet.encode_char('#') == '  '
+
+
+def test_cache_never_unpickles(tmp_path):
+    AlphabetRegistry(cache_dir=str(tmp_path)).get()
+    cache_path = os.path.join(tmp_path, get_cache_files(tmp_path)[0])
+    marker_path = os.path.join(tmp_path, "unpickled")
+
+    with open(cache_path, "wb") as file:
+        pickle.dump(_Planted(marker_path), file)
+
+    registry = AlphabetRegistry(cache_dir=str(tmp_path))
+    registry.get()
+    assert (registry.loads, registry.cache_loads) == (1, 0)
+    assert not os.path.exists(marker_path)
+
+
+def test_invalid_cache_is_ignored(tmp_path):
+    registry = AlphabetRegistry(cache_dir=str(tmp_path))
+    registry.get()
+    cache_path = os.path.join(tmp_path, get_cache_files(tmp_path)[0])
+
+    with open(cache_path, "r", encoding="utf-8") as file:
+        cache = json.load(file)
+
+    for content in ([], "text", dict(cache, version=0), dict(cache, compiled=[{}, {}]),
+                    dict(cache, compiled=[{"chars": "x"}, {}, {}, {}])):
+        with open(cache_path, "w", encoding="utf-8") as file:
+            json.dump(content, file)
+
+        registry = AlphabetRegistry(cache_dir=str(tmp_path))
+        assert registry.get().path == os.path.realpath(ALPHABET_PATH)
+        assert (registry.loads, registry.cache_loads) == (1, 0)
+
+
+def test_tables_are_immutable():
+    compiled = MorseConverter()._alphabet.get_compiled()
+    compiled[0]['chars']['S'] = '-'
+    compiled[3]['...'] = 'X'
+
+    converter = MorseConverter()
+    assert converter.morse_to_string("... --- ...") == "SOS"
+    assert converter.string_to_morse("S").startswith("...")
+
+    # Neither the tables given to the constructor
+    str_to_morse, morse_to_str, encode_table, decode_table = get_alphabet().get_compiled()
+    alphabet = MorseAlphabet(ALPHABET_PATH, str_to_morse, morse_to_str, encode_table, decode_table)
+    str_to_morse['chars']['S'] = '-'
+    decode_table['...'] = 'X'
+    encode_table['S'] = '- '
+    assert alphabet.str_to_morse['chars']['S'] == '...'
+    assert alphabet.decode_table['...'] == 'S'
+    assert alphabet.encode_char('S') == '... '
+
+
+def test_converter_cache_dir(tmp_path):
+    # An alphabet not loaded yet in the process is cached in the folder given to the converter
+    alphabet_path = tmp_path / "alphabet.json"
+    shutil.copy(ALPHABET_PATH, alphabet_path)
+    cache_dir = tmp_path / "cache"
+
+    converter = MorseConverter(alphabet_path=str(alphabet_path), alphabet_cache_dir=str(cache_dir))
+    assert len(get_cache_files(cache_dir)) == 1
+    assert converter.morse_to_string("... --- ...") == "SOS"
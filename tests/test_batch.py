@@ -0,0 +1,65 @@
+####################################################################################################################
+# IMPORTS
+import os
+
+from MorseBatch import STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED, collect_items, run_batch
+from MorseConverter import MorseTiming
+
+
+####################################################################################################################
+# CORE
+def write_inputs(root, texts):
+    # relative path -> text
+    paths = []
+    for relative_path, text in texts.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        paths.append(str(path))
+
+    return paths
+
+
+def get_out_names(items, out_dir):
+    return sorted(os.path.relpath(item.out_base, out_dir) for item in items)
+
+
+def test_expanded_glob_keeps_folders(tmp_path):
+    # What the shell passes for in/*/*.txt
+    paths = write_inputs(tmp_path / "in", {"a/x.txt": "SOS", "b/x.txt": "CQ", "b/y.txt": "DE"})
+    out_dir = str(tmp_path / "out")
+
+    items = collect_items(paths, out_dir)
+    assert get_out_names(items, out_dir) == [os.path.join("a", "x"), os.path.join("b", "x"), os.path.join("b", "y")]
+    assert all(item.error is None for item in items)
+
+    quoted_items = collect_items([str(tmp_path / "in" / "*" / "*.txt")], out_dir)
+    assert get_out_names(quoted_items, out_dir) == get_out_names(items, out_dir)
+
+
+def test_clash_fails_only_its_items(tmp_path):
+    paths = write_inputs(tmp_path, {"a/x.txt": "SOS", "b/x.txt": "CQ", "c/y.txt": "DE"})
+    out_dir = str(tmp_path / "out")
+
+    # The folders of a/ and b/ are dropped by their patterns, so both x.txt files write out/x.*
+    items = collect_items([str(tmp_path / "a" / "*.txt"), str(tmp_path / "b" / "*.txt"), paths[2]], out_dir)
+    assert [item.error is not None for item in items] == [True, True, False]
+
+    summary = run_batch(items, ("morse",), workers=1)
+    assert (summary[STATUS_DONE], summary[STATUS_FAILED]) == (1, 2)
+    assert os.listdir(out_dir) == ["y.morse"]
+
+
+def test_new_timing_renders_again(tmp_path):
+    paths = write_inputs(tmp_path / "in", {"x.txt": "SOS"})
+    out_dir = str(tmp_path / "out")
+
+    def run(formats, duration_dot):
+        summary = run_batch(collect_items(paths, out_dir), formats, workers=1, timing=MorseTiming(duration_dot))
+        return summary[STATUS_DONE], summary[STATUS_SKIPPED]
+
+    assert run(("morse", "wav"), 0.1) == (1, 0)
+    assert run(("morse", "wav"), 0.1) == (0, 1)
+    assert run(("morse", "wav"), 0.05) == (1, 0)
+    assert run(("morse",), 0.1) == (0, 1)  # The morse text doesn't depend on the timing
+    assert run(("morse", "wav"), 0.05) == (0, 1)
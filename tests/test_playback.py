@@ -0,0 +1,95 @@
+####################################################################################################################
+# IMPORTS
+import threading
+
+import numpy as np
+import pytest
+
+from MorseAudioCache import AudioCache
+from MorseConverter import MorseConverter, NullOutputStream
+
+
+####################################################################################################################
+# CONSTANTS
+MORSE_TEXT = MorseConverter().string_to_morse("CQ DE IZ0ABC")
+
+
+####################################################################################################################
+# CORE
+class RecordingFactory:
+    # Stream factory keeping the streams it builds, so their played blocks can be checked
+    def __init__(self, stream_class=NullOutputStream):
+        self.stream_class = stream_class
+        self.streams = []
+
+    def __call__(self, **kwargs):
+        stream = self.stream_class(**kwargs)
+        self.streams.append(stream)
+        return stream
+
+    def get_played(self):
+        return np.concatenate(self.streams[0].blocks)[:, 0]
+
+
+class AbortedStream(NullOutputStream):
+    # Plays a single block then stops, like a device going away
+    def _run(self):
+        try:
+            outdata = np.empty((self.blocksize, self.channels), dtype=self.dtype)
+            self.callback(outdata, self.blocksize, None, None)
+            self.blocks.append(outdata)
+        finally:
+            self.finished_callback()
+
+
+class StalledStream(NullOutputStream):
+    # Never pulls any audio
+    def start(self):
+        pass
+
+
+@pytest.mark.parametrize("audio_cache", [None, AudioCache()])
+def test_play_stream_output(audio_cache):
+    converter = MorseConverter(audio_cache=audio_cache)
+    factory = RecordingFactory()
+    converter.play_stream(MORSE_TEXT, stream_factory=factory)
+
+    reference = converter.synthesize(MORSE_TEXT, np.int16)
+    played = factory.get_played()
+    assert np.array_equal(played[:len(reference)], reference)
+    assert not played[len(reference):].any()
+
+
+def test_play_stream_stop_event():
+    converter = MorseConverter()
+    factory = RecordingFactory()
+    stop_event = threading.Event()
+    samples_count = converter.get_samples_count(MORSE_TEXT)
+
+    def on_progress(samples_done, _):
+        if samples_done >= samples_count // 4:
+            stop_event.set()
+
+    converter.play_stream(MORSE_TEXT, stop_event=stop_event, stream_factory=factory, on_progress=on_progress)
+    assert np.count_nonzero(factory.get_played()) < np.count_nonzero(converter.synthesize(MORSE_TEXT, np.int16))
+
+
+def test_play_stream_callback_error():
+    def on_progress(samples_done, _):
+        raise ValueError("Progress failed")
+
+    with pytest.raises(ValueError, match="Progress failed"):
+        MorseConverter().play_stream(MORSE_TEXT, stream_factory=RecordingFactory(), on_progress=on_progress)
+
+
+def test_play_stream_aborted():
+    with pytest.raises(RuntimeError, match="aborted"):
+        MorseConverter().play_stream(MORSE_TEXT, stream_factory=RecordingFactory(AbortedStream))
+
+
+def test_play_stream_timeout():
+    converter = MorseConverter()
+    converter.PLAY_TIMEOUT_MARGIN = 0
+
+    with pytest.raises(TimeoutError):
+        converter.play_stream(converter.string_to_morse("E"), stream_factory=RecordingFactory(StalledStream))
@@ -0,0 +1,96 @@
+####################################################################################################################
+# IMPORTS
+import io
+
+import numpy as np
+import pytest
+
+from MorseConverter import MorseConverter, MorseTiming
+
+
+####################################################################################################################
+# CONSTANTS
+TEXTS = ["SOS", "HELLO WORLD", "CQ DE IZ0ABC 73", "FED CAB"]
+NOISE_LEVELS = [0.0, 0.1, 0.3]
+SEED = 7
+
+
+####################################################################################################################
+# TESTS
+@pytest.fixture(params=[0.1, 0.06])
+def converter(request):
+    return MorseConverter(timing=MorseTiming(request.param))
+
+
+def add_noise(morse_audio, noise_level, seed=SEED):
+    return morse_audio + np.random.default_rng(seed).normal(0, noise_level, len(morse_audio))
+
+
+def standard_morse_process(converter, text):
+    # Standard timing, as keyed by hand: 1 unit between elements, 3 between letters and 7 between words
+    dot_samples = int(converter.SAMPLING_RATE * converter.duration_dot)
+    tone = 0.5 * np.sin(2 * np.pi * converter.FREQUENCY * np.arange(3 * dot_samples) / converter.SAMPLING_RATE)
+
+    parts = [np.zeros(7 * dot_samples)]
+    for word in text.split(" "):
+        for letter in word:
+            for element in converter.string_to_morse(letter).split()[0]:
+                parts += [tone[:dot_samples if element == "." else 3 * dot_samples], np.zeros(dot_samples)]
+
+            parts.append(np.zeros(2 * dot_samples))
+
+        parts.append(np.zeros(4 * dot_samples))
+
+    return np.concatenate(parts)
+
+
+@pytest.mark.parametrize("noise_level", NOISE_LEVELS)
+@pytest.mark.parametrize("text", TEXTS)
+def test_round_trip(converter, text, noise_level):
+    morse_text = converter.string_to_morse(text)
+    morse_audio = add_noise(converter.morse_process(morse_text), noise_level)
+
+    assert converter.audio_to_morse(morse_audio) == morse_text
+    assert converter.morse_to_string(converter.audio_to_morse(morse_audio)) == text
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_round_trip_wav(converter, text):
+    morse_text = converter.string_to_morse(text)
+    wav_file = io.BytesIO()
+    converter.export_wav(morse_text, wav_file)
+    wav_file.seek(0)
+
+    assert converter.wav_to_string(wav_file) == text
+
+
+@pytest.mark.parametrize("noise_level", NOISE_LEVELS)
+@pytest.mark.parametrize("text", TEXTS)
+def test_round_trip_stream(converter, text, noise_level):
+    morse_audio = add_noise(converter.morse_process(converter.string_to_morse(text)), noise_level)
+    decoder = converter.create_stream_decoder()
+
+    decoded = [decoder.feed(morse_audio[start:start + 4096]) for start in range(0, len(morse_audio), 4096)]
+    decoded.append(decoder.flush())
+
+    assert ''.join(decoded).strip() == text
+
+
+@pytest.mark.parametrize("noise_level", [0.05, 0.3])
+def test_noise_only_decodes_nothing(converter, noise_level):
+    noise = np.random.default_rng(SEED).normal(0, noise_level, 3 * converter.SAMPLING_RATE)
+
+    assert converter.audio_to_morse(noise) == ""
+    assert converter.audio_to_morse(np.zeros(converter.SAMPLING_RATE)) == ""
+    assert converter.audio_to_morse(np.zeros(converter.SAMPLING_RATE, dtype=np.int16)) == ""
+
+
+@pytest.mark.parametrize("noise_level", NOISE_LEVELS)
+@pytest.mark.parametrize("text", TEXTS + ["CQ DE", "E E T T"])
+def test_standard_timing(converter, text, noise_level):
+    morse_audio = add_noise(standard_morse_process(converter, text), noise_level)
+    decoder = converter.create_stream_decoder()
+
+    assert ''.join(decoder.decode_blocks(morse_audio[start:start + 4096]
+                                         for start in range(0, len(morse_audio), 4096))).strip() == text
+    assert converter.morse_to_string(converter.audio_to_morse(morse_audio)) == text
@@ -0,0 +1,95 @@
+####################################################################################################################
+# IMPORTS
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+from MorseAudioDecoder import read_wav
+from MorseConverter import MorseConverter
+from MorseService import MorseService
+
+
+####################################################################################################################
+# HELPERS
+async def post(port, path, body):
+    # Minimal HTTP/1.0 client: returns (status, headers, body), with the chunked body reassembled
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"POST {path} HTTP/1.0\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        data = b""
+        while (size := int(await reader.readline(), 16)) > 0:
+            data += await reader.readexactly(size)
+            await reader.readexactly(2)
+    else:
+        data = await reader.read()
+
+    writer.close()
+    return status, headers, data
+
+
+def run_service(coroutine_function, **attributes):
+    async def main():
+        service = MorseService(workers=2)
+        for name, value in attributes.items():
+            setattr(service, name, value)
+
+        server = await service.start(port=0)
+        try:
+            return service, await coroutine_function(server.sockets[0].getsockname()[1], service)
+        finally:
+            server.close()
+            service.close()
+
+    return asyncio.run(main())
+
+
+####################################################################################################################
+# TESTS
+@pytest.mark.parametrize("coalesce_max_seconds", [60, 1])
+def test_render_matches_synthesize(coalesce_max_seconds):
+    # Under the limit the signal is rendered whole, over it streamed from the pool a few chunks at a time
+    text = "CQ CQ DE IZ0ABC"
+
+    async def client(port, service):
+        return await post(port, "/render", text.encode())
+
+    service, (status, headers, data) = run_service(client, COALESCE_MAX_SECONDS=coalesce_max_seconds)
+    converter = MorseConverter()
+
+    assert status == 200 and headers["transfer-encoding"] == "chunked"
+    assert np.array_equal(read_wav(io.BytesIO(data))[1], converter.synthesize(converter.string_to_morse(text),
+                                                                              np.int16))
+    assert service.streams == (1 if coalesce_max_seconds == 1 else 0)
+
+
+def test_identical_renders_are_coalesced():
+    async def client(port, service):
+        return await asyncio.gather(*[post(port, "/render", b"SOS") for _ in range(4)])
+
+    service, responses = run_service(client)
+
+    assert len({data for _, _, data in responses}) == 1
+    assert service.render_calls + service.coalesced == 4 and service.render_calls < 4
+
+
+def test_encode_decode_and_errors():
+    async def client(port, service):
+        return (await post(port, "/encode", b"sos"), await post(port, "/decode", b"... --- ..."),
+                await post(port, "/nope", b""), await post(port, "/render?morse=1", b"... --- ... | " * 20000))
+
+    _, (encoded, decoded, not_found, too_long) = run_service(client)
+
+    assert encoded[0] == 200 and encoded[2] == b"... --- ..."
+    assert decoded[2] == b"SOS"
+    assert not_found[0] == 404
+    assert too_long[0] == 413
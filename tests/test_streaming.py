@@ -0,0 +1,65 @@
+####################################################################################################################
+# IMPORTS
+import tracemalloc
+
+import numpy as np
+
+from MorseAudioCache import AudioCache
+from MorseConverter import MorseConverter
+
+
+####################################################################################################################
+# CONSTANTS
+MORSE_TEXT = MorseConverter().string_to_morse("CQ DE IZ0ABC " * 20)  # About 30 MB of int16 samples
+
+
+####################################################################################################################
+# CORE
+def get_peak_bytes(call):
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_export_wav_miss_stays_flat(tmp_path):
+    # Larger than the memory budget: streamed without rendering the whole signal, and not cached
+    converter = MorseConverter(audio_cache=AudioCache(memory_budget=1024 * 1024))
+
+    peak_bytes = get_peak_bytes(lambda: converter.export_wav(MORSE_TEXT, str(tmp_path / "morse.wav")))
+    assert peak_bytes < 1024 * 1024
+    assert converter.audio_cache.get_stats()["memory_entries"] == 0
+
+
+def test_first_chunk_with_cache():
+    converter = MorseConverter(audio_cache=AudioCache(memory_budget=1024 * 1024))
+    chunks = converter.iter_audio_chunks(MORSE_TEXT)
+
+    peak_bytes = get_peak_bytes(lambda: next(chunks))
+    assert peak_bytes < 1024 * 1024
+
+    # A signal fitting the cache only costs its cached copy, and stopping before the end caches nothing
+    converter = MorseConverter(audio_cache=AudioCache())
+    chunks = converter.iter_audio_chunks(MORSE_TEXT)
+    signal_bytes = converter.get_samples_count(MORSE_TEXT) * 2
+
+    peak_bytes = get_peak_bytes(lambda: next(chunks))
+    assert peak_bytes < signal_bytes + 1024 * 1024
+
+    chunks.close()
+    assert converter.audio_cache.get_stats()["memory_entries"] == 0
+
+
+def test_streamed_miss_fills_cache():
+    converter = MorseConverter(audio_cache=AudioCache())
+    reference = converter.synthesize(MORSE_TEXT, np.int16)
+
+    assert np.array_equal(np.concatenate(list(converter.iter_audio_chunks(MORSE_TEXT))), reference)
+    stats = converter.audio_cache.get_stats()
+    assert (stats["misses"], stats["memory_entries"]) == (1, 1)
+
+    assert np.array_equal(np.concatenate(list(converter.iter_audio_chunks(MORSE_TEXT))), reference)
+    assert np.array_equal(converter.render_audio(MORSE_TEXT), reference)
+    assert converter.audio_cache.get_stats()["memory_hits"] == 2
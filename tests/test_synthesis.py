@@ -0,0 +1,92 @@
+####################################################################################################################
+# IMPORTS
+import numpy as np
+import pytest
+
+from MorseConverter import MorseConverter, MorseTiming
+
+
+####################################################################################################################
+# CONSTANTS
+TEXTS = ["SOS", "HELLO WORLD", "CQ DE IZ0ABC 73", "FED CAB", "A#B  C", "?!.,", ""]
+DURATION_DOTS = [0.1, 0.06, 0.033, 0.25]
+
+
+####################################################################################################################
+# REFERENCE
+def legacy_morse_process(morse_text, duration_dot):
+    # The original renderer, concatenating a new segment for every char, kept as the reference of the synthesis.
+    # Only change: '_' is keyed as a dash, like every renderer does since the alphabet fix of C, D and F
+    duration_dash = duration_dot * 3
+    duration_pause = duration_dot * 7
+
+    def get_signal_wave(duration):
+        t = np.linspace(0, duration, int(MorseConverter.SAMPLING_RATE * duration), endpoint=False)
+        return 0.5 * np.sin(2 * np.pi * MorseConverter.FREQUENCY * t)
+
+    def get_silence_wave(duration):
+        t_silence = np.linspace(0, duration, int(MorseConverter.SAMPLING_RATE * duration), endpoint=False)
+        return np.zeros_like(t_silence)
+
+    morse_audio = np.array([])
+    morse_audio = np.concatenate((morse_audio, get_silence_wave(duration_dash)))
+
+    for char in morse_text:
+        match char:
+            case ".":
+                morse_audio = np.concatenate((morse_audio, get_signal_wave(duration_dot)))
+
+            case "-" | "_":
+                morse_audio = np.concatenate((morse_audio, get_signal_wave(duration_dash)))
+
+            case " ":
+                morse_audio = np.concatenate((morse_audio, get_silence_wave(duration_dash)))
+
+            case "|":
+                morse_audio = np.concatenate((morse_audio, get_silence_wave(duration_pause)))
+
+        morse_audio = np.concatenate((morse_audio, get_silence_wave(duration_dot)))
+
+    morse_audio = np.concatenate((morse_audio, get_silence_wave(duration_dash)))
+    return morse_audio
+
+
+####################################################################################################################
+# TESTS
+@pytest.fixture(params=DURATION_DOTS)
+def converter(request):
+    return MorseConverter(timing=MorseTiming(request.param))
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_synthesize_matches_legacy(converter, text):
+    morse_text = converter.string_to_morse(text)
+    reference = legacy_morse_process(morse_text, converter.duration_dot)
+
+    assert np.array_equal(converter.synthesize(morse_text), reference)
+    assert np.array_equal(converter.morse_process(morse_text), reference)
+    assert converter.get_samples_count(morse_text) == len(reference)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_int16_matches_legacy_scaling(converter, text):
+    morse_text = converter.string_to_morse(text)
+    reference = np.int16(legacy_morse_process(morse_text, converter.duration_dot) * 32767)
+
+    assert np.array_equal(converter.synthesize(morse_text, np.int16), reference)
+    assert np.array_equal(converter.morse_process(morse_text, dtype=np.int16), reference)
+
+
+def test_underscore_dashes_match_legacy():
+    converter = MorseConverter()
+    morse_text = "-.-. _.._ ..-. | ..__"
+
+    assert np.array_equal(converter.synthesize(morse_text), legacy_morse_process(morse_text, converter.duration_dot))
+
+
+def test_parallel_matches_legacy():
+    converter = MorseConverter()
+    morse_text = converter.string_to_morse("THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG")
+    reference = legacy_morse_process(morse_text, converter.duration_dot)
+
+    assert np.array_equal(converter.synthesize(morse_text, workers=3, executor="thread"), reference)
@@ -0,0 +1,52 @@
+####################################################################################################################
+# IMPORTS
+import numpy as np
+import pytest
+
+from MorseConverter import MorseConverter, MorseTiming, WaveTemplateCache
+
+
+####################################################################################################################
+# CORE
+def test_lru():
+    cache = WaveTemplateCache(maxsize=2)
+    builds = []
+
+    def get(key):
+        return cache.get(key, lambda: builds.append(key) or np.full(4, len(builds)))
+
+    first = get("a")
+    assert get("a") is first
+    get("b")
+    get("a")  # "b" is now the least recently used
+    get("c")
+
+    assert builds == ["a", "b", "c"]
+    assert cache.get_stats() == {"hits": 2, "misses": 3, "evictions": 1, "size": 2, "maxsize": 2}
+
+    get("b")
+    assert builds == ["a", "b", "c", "b"]
+    assert get("a") is not first
+
+    cache.clear()
+    assert cache.get_stats() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 2}
+
+
+def test_templates_are_read_only():
+    template = WaveTemplateCache().get("a", lambda: np.zeros(4))
+    with pytest.raises(ValueError):
+        template[0] = 1
+
+
+def test_converter_templates(monkeypatch):
+    # A dot and a dash per timing and dtype, shared by every converter of the process
+    monkeypatch.setattr(MorseConverter, "wave_templates", WaveTemplateCache())
+    morse_text = MorseConverter().string_to_morse("SOS TEST")
+
+    MorseConverter().synthesize(morse_text, np.int16)
+    MorseConverter().synthesize(morse_text, np.int16)
+    MorseConverter(timing=MorseTiming(0.05)).synthesize(morse_text)
+
+    stats = MorseConverter.wave_templates.get_stats()
+    assert (stats["misses"], stats["size"]) == (4, 4)
+    assert stats["hits"] > 0